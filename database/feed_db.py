@@ -14,6 +14,10 @@ with engine.connect() as conn:
     #Load df
     df = pd.read_csv('data/history.csv')
 
+    # Every row has the same columns, find the last creatinine_date_x index once
+    date_cols = [c for c in df.columns if c.startswith('creatinine_date_')]
+    max_index = max((int(c.rsplit('_', 1)[1]) for c in date_cols), default=0)
+
     # Write a pandas DataFrame to MySQL
     # Add code to feed the database
 
@@ -30,7 +34,6 @@ with engine.connect() as conn:
         conn.commit()
 
         #Iterate through the measurements named creatinine_date_x,creatinine_result_x
-        max_index = max([int(x.split('_')[2]) for x in row.keys() if 'creatinine_date' in x])
         query = ""
         
         for i in range(1, max_index+1):
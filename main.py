@@ -21,6 +21,7 @@ from src.pager import Pager
 from src.mysql_database import MySQLDatabase
 from src.parser import HL7Parser
 from src.database_populator import DatabasePopulator
+import logging
 import os
 
 def main():
@@ -105,6 +106,8 @@ if __name__ == "__main__":
     """
     Entry point for running the system.
     """
+    # Logging is configured once here, the modules only emit records
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
     main()
    
 
@@ -9,7 +9,7 @@ import sys
 import argparse
 import matplotlib.pyplot as plt
 from joblib import dump, load
-from utils import preprocess
+from utils import read_dataset, preprocess, align_features
 
 def log_roc_curve(X_test, y_test, model, experiment_name="ROC Curve", ):
     """Logs the ROC curve to MLflow."""
@@ -45,7 +45,7 @@ def get_last_model_iteration():
 def eval(dataset_path, model_path, mlflow_bool):
     """Evaluate predictions and log metrics using MLflow."""
     try:
-        dataset = pd.read_csv(dataset_path)
+        dataset = read_dataset(dataset_path)
 
     except Exception as e:
         print(f"Error loading evaluation or input data: {e}")
@@ -53,10 +53,10 @@ def eval(dataset_path, model_path, mlflow_bool):
     print(dataset.columns)
     y_test = dataset['aki'].map({'y': 1, 'n': 0})
     X_before = dataset.drop(['aki'], axis=1)
-    X_test = preprocess(X_before, train=False)
 
     # Load the model
     model = load(model_path) if model_path else load(f"model/model_iterations/{get_last_model_iteration()}")
+    X_test = align_features(preprocess(X_before, train=False), model)
 
     y_pred = model.predict(X_test)
     # Calculate metrics
@@ -1,54 +1,122 @@
 import os
+import numpy as np
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder
+
+# Fixed label codes, in the order LabelEncoder assigned them when the model was trained
+SEX_CODES = {'f': 0, 'F': 0, 'm': 1, 'M': 1}
+AKI_CODES = {'n': 0, 'N': 0, 'y': 1, 'Y': 1}
+
+# Measurement columns of a patient file, in slot (time) order
+MAX_SLOTS = 50
+DATE_COLS = tuple(f'creatinine_date_{i}' for i in range(MAX_SLOTS))
+RESULT_COLS = tuple(f'creatinine_result_{i}' for i in range(MAX_SLOTS))
+
+# Explicit dtypes for every column a patient CSV can hold, so the parser does not have to infer them
+# (slots missing from a given file are ignored)
+CSV_DTYPES = {
+    'sex': 'category',
+    'aki': 'category',
+    **{col: np.float32 for col in RESULT_COLS},
+}
+
+
+def read_dataset(path):
+    """Reads a patient CSV with explicit dtypes, dates are parsed later by process_dates."""
+    return pd.read_csv(path, dtype=CSV_DTYPES)
+
+
+def slot_count(df):
+    """Number of date/result slots in a patient frame laid out as age, sex and then the slot pairs."""
+    return (len(df.columns) - 2) // 2
+
 
 def add_padding(df):
     """Ensures the dataframe has a constant length of 50."""
-    for i in range(((len(df.columns) - 2) // 2), 50):
-        df[f'creatinine_date_{i}'] = 0
-        df[f'creatinine_result_{i}'] = 0
-    return df
+    start = slot_count(df)
+    if start >= MAX_SLOTS:
+        return df
+    # Allocate every padding column in one block rather than inserting them one at a time
+    padding_cols = [col for i in range(start, MAX_SLOTS) for col in (DATE_COLS[i], RESULT_COLS[i])]
+    padding = pd.DataFrame(0, index=df.index, columns=padding_cols)
+    return pd.concat([df, padding], axis=1)
 
 
 def process_dates(df):
     """Converts timestamps to seconds relative to the first measurement."""
-    date_cols = [col for col in df.columns if "creatinine_date" in col]
-    for col in date_cols:
-        df[col] = pd.to_datetime(df[col], errors='coerce')
-    df['ref_date'] = df[date_cols].min(axis=1)
-    for col in date_cols:
-        df[col] = (df[col] - df['ref_date']).dt.total_seconds()
-    df = df.drop(columns=['ref_date']).fillna(0)
+    date_cols = list(DATE_COLS[:slot_count(df)])
+    # Parse every date cell in one call on the stacked block instead of once per column
+    values = df[date_cols].to_numpy().ravel(order='F')
+    parsed = pd.to_datetime(values, errors='coerce').values.reshape(len(df), len(date_cols), order='F')
+    # Work on whole seconds as integers, missing dates (NaT) stay 0
+    present = ~np.isnat(parsed)
+    secs = parsed.astype('datetime64[s]').view('i8')
+    ref = secs.min(axis=1, where=present, initial=np.iinfo('i8').max, keepdims=True)
+    df[date_cols] = np.where(present, secs - ref, 0).astype(np.int32)
+    df = df.fillna(0)
     return df
 
 def process_features(df):
     """Feature engineering for AKI prediction."""
-    results_cols = [col for col in df.columns if "creatinine_result" in col]
+    results_cols = list(RESULT_COLS[:slot_count(df)])
 
     df = process_dates(df)
     df = add_padding(df)
 
-    df['creatinine_mean'] = df[results_cols].mean(axis=1)
-    df['creatinine_median'] = df[results_cols].median(axis=1, skipna=True)
-    df['creatinine_max'] = df[results_cols].max(axis=1)
-    df['creatinine_min'] = df[results_cols].min(axis=1)
-    df["creatinine_max_delta"] = df[results_cols].diff(axis=1).max(axis=1).fillna(0)
-    df['creatinine_std'] = df[results_cols].std(axis=1)
-    df['most_recent'] = df[results_cols].apply(lambda row: row.dropna().iloc[-1] if not row.dropna().empty else None, axis=1)
-    df['rv1_ratio'] = df['most_recent'] / df['creatinine_min']
-    df['rv2_ratio'] = df['most_recent'] / df['creatinine_median']
+    # Extract the result block once and compute every aggregate from the same array,
+    # missing results are already 0 at this point so plain reductions apply
+    arr = df[results_cols].to_numpy(dtype=np.float64)
+    mean = arr.mean(axis=1)
+    median = np.median(arr, axis=1)
+    mx = arr.max(axis=1)
+    mn = arr.min(axis=1)
+    max_delta = np.diff(arr, axis=1).max(axis=1) if arr.shape[1] > 1 else np.zeros(len(arr))
+    std = arr.std(axis=1, ddof=1)
+
+    # The most recent measurement is the last non-zero entry of each row (columns are in time order)
+    mask = arr != 0
+    last_idx = arr.shape[1] - 1 - np.argmax(mask[:, ::-1], axis=1)
+    most_recent = np.where(mask.any(axis=1), arr[np.arange(len(arr)), last_idx], np.nan)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rv1_ratio = most_recent / mn
+        rv2_ratio = most_recent / median
+    # Zero-filled gaps make the minimum/median 0, XGBoost rejects the resulting inf so mark it missing
+    rv1_ratio[~np.isfinite(rv1_ratio)] = np.nan
+    rv2_ratio[~np.isfinite(rv2_ratio)] = np.nan
 
+    df = df.assign(
+        creatinine_mean=mean,
+        creatinine_median=median,
+        creatinine_max=mx,
+        creatinine_min=mn,
+        creatinine_max_delta=max_delta,
+        creatinine_std=std,
+        most_recent=most_recent,
+        rv1_ratio=rv1_ratio,
+        rv2_ratio=rv2_ratio,
+    )
+
+    # XGBoost bins float32 internally, so hand it float32 instead of copying a float64 matrix
+    numeric_cols = df.select_dtypes(include='number').columns
+    df[numeric_cols] = df[numeric_cols].astype(np.float32)
     return df
 
 def preprocess(df, train):
         """Prepares data for model training or inference."""
-        le = LabelEncoder()
-        df['sex'] = le.fit_transform(df['sex'])
+        df['sex'] = df['sex'].map(SEX_CODES).astype(np.int8)
         if train:
             x_train = process_features(df.drop(columns='aki'))
-            df['aki'] = le.fit_transform(df['aki'])
+            df['aki'] = df['aki'].map(AKI_CODES).astype(np.int8)
             y_train = df['aki']
             return x_train, y_train
         else:
-            return process_features(df)
-        
+            # Labelled files keep their (categorical) aki column, it is not a feature
+            return process_features(df.drop(columns='aki', errors='ignore'))
+
+
+def align_features(x, model):
+    """Aligns inference features to the column schema stored on the model at training time."""
+    feature_columns = getattr(model, 'feature_columns_', None)
+    if feature_columns is None:
+        return x
+    return x.reindex(columns=feature_columns, fill_value=0)
@@ -1,4 +1,3 @@
-import logging
 """
 Data Operator Module
 ====================
@@ -23,12 +22,54 @@ Example:
 
 """
 
+from collections import OrderedDict
 import logging
+import sys
 from src.database import Database
 from src.model import Model
 from src.pager import Pager
+from src.parser import parse_hl7_timestamp
+
+logger = logging.getLogger(__name__)
+
+# Number of patient vectors kept in memory between blood tests
+VECTOR_CACHE_SIZE = 10000
+
+
+def _time_key(test_time):
+    """
+    Normalizes a measurement time, so that the HL7 string of a test and the date the database
+    returns for it compare equal.
+
+    Args:
+        test_time (str | datetime): Timestamp of the test.
+
+    Returns:
+        datetime | object: The parsed timestamp, the value itself if it is not a parsable string.
+    """
+    if isinstance(test_time, str):
+        try:
+            return parse_hl7_timestamp(test_time)
+        except ValueError:
+            return test_time
+    return test_time
+
+
+def _is_after(key, latest):
+    """
+    Checks whether a measurement time comes after the latest cached one.
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    Args:
+        key (datetime | object): Normalized time of the new measurement.
+        latest (datetime | object): Normalized time of the latest cached measurement.
+
+    Returns:
+        bool: True if the new measurement is later, False if it is not or the times do not compare.
+    """
+    try:
+        return key > latest
+    except TypeError:
+        return False
 
 class DataOperator:
     """
@@ -42,6 +83,10 @@ class DataOperator:
     - `expected_columns (dict)`: Expected column names for data consistency.
     - `msg_queue (list)`: Queue for storing incoming HL7 messages.
     - `predict_queue (list)`: Queue for storing patient data for prediction.
+    - `_vector_cache (OrderedDict)`: LRU cache of `[age, sex, results, slots]` per MRN, so that a new
+      blood test is added in memory instead of reading the patient's whole history again. `slots` maps
+      each measurement time to its index in `results`, a test sent again replaces its result like the
+      database does and a test older than the cached ones reloads the patient, keeping the time order.
     """
     def __init__(self, database: Database, model: Model, pager: Pager):
         """
@@ -55,6 +100,59 @@ class DataOperator:
         self.database = database 
         self.model = model
         self.pager = pager
+        self._vector_cache = OrderedDict()
+
+        # Message type -> handler, so that dispatching a message is a single lookup.
+        # The keys are interned like the types the parser produces, so the lookup matches on identity
+        self._dispatch = {
+            sys.intern("ORU^R01"): self.process_oru_message,
+            sys.intern("ADT^A01"): self.process_adt_message,
+            sys.intern("ADT^A03"): self._on_discharge,
+        }
+
+    def _patient_vector(self, mrn, creatinine_value, test_time):
+        """
+        Returns the patient's data including the new measurement, from the cache when possible.
+        The new measurement must already be stored in the database.
+
+        Args:
+            mrn (int): Patient's medical record number.
+            creatinine_value (float): Latest creatinine test result.
+            test_time (str): Timestamp of the test.
+
+        Returns:
+            list | None: [age, sex, results, slots] with the results as a list of floats in time order,
+                         None if the patient does not exist.
+        """
+        entry = self._vector_cache.get(mrn)
+        if entry is None:
+            feature_row = self.database.get_feature_row(mrn) # Pull all data, including new measurment
+            if feature_row is None:
+                return None
+            age, sex, dates, results = feature_row
+            slots = {_time_key(date): i for i, date in enumerate(dates)}
+            entry = self._vector_cache[mrn] = [age, sex, results.tolist(), slots]
+            if len(self._vector_cache) > VECTOR_CACHE_SIZE:
+                self._vector_cache.popitem(last=False)
+            return entry
+
+        # Cache hit: add the new measurement to the stored vector, a test seen before
+        # (e.g. a message sent again because it was not acknowledged) only replaces its result.
+        # slots is filled in the order of results, so its last key is the latest cached test
+        results, slots = entry[2], entry[3]
+        key = _time_key(test_time)
+        index = slots.get(key)
+        if index is not None:
+            results[index] = creatinine_value
+        elif not slots or _is_after(key, next(reversed(slots))):
+            slots[key] = len(results)
+            results.append(creatinine_value)
+        else:
+            # A late result belongs before the cached ones, read the history back in time order
+            del self._vector_cache[mrn]
+            return self._patient_vector(mrn, creatinine_value, test_time)
+        self._vector_cache.move_to_end(mrn)
+        return entry
 
 
     def process_patient(self, mrn, creatinine_value, test_time):
@@ -66,33 +164,31 @@ class DataOperator:
             creatinine_value (float): Latest creatinine test result.
             test_time (str): Timestamp of the test.
         """
-        logging.info(f"[WORKER] Processing Patient {mrn} at {test_time}...")
+        logger.info("[WORKER] Processing Patient %s at %s...", mrn, test_time)
         
         # Measurment added first 
-        self.database.add_measurement(mrn, creatinine_value, test_time) 
+        if not self.database.add_measurement(mrn, creatinine_value, test_time):
+            # The database does not have it, drop the cached vector so it is read back as stored
+            logger.warning("Measurement for patient %s was not stored", mrn)
+            self._vector_cache.pop(mrn, None)
         
-        patient_vector = self.database.get_data(mrn) # Pull all data, including new measurment
-        
-        logging.info(f"HERE!!! CHECK WHAT MODEL GETS: {patient_vector.columns.tolist()}")
-        
-        # TODO: Check if this  is ok????
-        # Convert `measurement_date` to UNIX timestamp for XGBoost compatibility
-        if "measurement_date" in patient_vector.columns:
-            patient_vector["measurement_date"] = patient_vector["measurement_date"].astype("int64") // 10**9
-
+        patient_vector = self._patient_vector(mrn, creatinine_value, test_time)
+        if patient_vector is None:
+            logger.error("No data found for patient %s, skipping the prediction", mrn)
+            return False
+        age, sex, results, _ = patient_vector
         
         # if aki-prediction is positive, send a pager alert
         try:
-            positive_prediction = self.model.predict_aki(patient_vector)
+            # The features are computed straight from the results, no DataFrame on this path
+            positive_prediction = self.model.predict_one(age, sex, results)
         except Exception as e:
-            logging.error(f"Error from model.py\nException:\n{e}")
+            logger.error("Error from model.py\nException:\n%s", e)
             return False
         
         if positive_prediction:
             self.pager.send_pager_alert(mrn, test_time)
 
-        # kept this from before
-        self.database.add_measurement(mrn, creatinine_value, test_time) 
         return True
 
     def process_adt_message(self, message):  
@@ -113,8 +209,9 @@ class DataOperator:
 
 
         self.database.add_patient(mrn, age, sex)
+        self._vector_cache.pop(mrn, None)  # Demographics changed
 
-        logging.info(f"Patient {name} with MRN {mrn} added to the database")
+        logger.info("Patient %s with MRN %s added to the database", name, mrn)
         return True
         
 
@@ -129,14 +226,29 @@ class DataOperator:
         Returns:
             bool: True to indicate prediction processing was initiated.
         """
-        mrn = message[2][0]["mrn"]
-        creatinine_value = message[2][0]["test_value"]
-        test_time = message[2][0]["test_time"]
+        # Only the first test is used, index into the message once
+        blood_test = message[2][0]
+        mrn = blood_test["mrn"]
+        creatinine_value = blood_test["test_value"]
+        test_time = blood_test["test_time"]
 
-        logging.info(f"Patient {mrn} has creatinine value {creatinine_value} at {test_time}")
+        logger.info("Patient %s has creatinine value %s at %s", mrn, creatinine_value, test_time)
         status = self.process_patient(mrn, creatinine_value, test_time)
         return status
 
+    def _on_discharge(self, message):
+        """
+        Handles an ADT^A03 (discharge) message by dropping the patient's cached vector.
+
+        Args:
+            message (tuple): Parsed HL7 message containing patient data.
+
+        Returns:
+            bool: True to indicate processing was successful.
+        """
+        self._vector_cache.pop(message[1].get("mrn"), None)
+        return True
+
     def process_message(self, message):
         """
         Determines the type of HL7 message and processes it accordingly.
@@ -147,14 +259,30 @@ class DataOperator:
         Returns:
             bool: True if a prediction was made, False otherwise.
         """
-        if message[0] == "ORU^R01":
-            status = self.process_oru_message(message) # need to return false after 
-        elif message[0] == "ADT^A01":
-            status = self.process_adt_message(message) # need to return true after 
-        elif message[0] == "ADT^A03":
-            status = True # TODO: THIS IS A PLACEHOLDER, NEED TO IMPLEMENT PROCEDURE FOR THIS
-        else:
-            logging.error(f"Unknown Message type {message}")
+        handler = self._dispatch.get(message[0])
+        if handler is None:
+            logger.error("Unknown Message type %s", message)
             raise ValueError(f"Unknown Message type{message}")
         
+        status = handler(message)
         return status # return True if everything worked, False if something went wrong, so that we do not send an ack regardless
+
+    def process_messages(self, messages):
+        """
+        Processes a batch of parsed HL7 messages in order.
+        A message that fails does not stop the rest of the batch.
+
+        Args:
+            messages (list): Parsed HL7 messages.
+
+        Returns:
+            list: One status per message, True if it was processed and can be acknowledged.
+        """
+        statuses = []
+        for message in messages:
+            try:
+                statuses.append(self.process_message(message))
+            except Exception as e:
+                logger.error("Data Operator could not process message!\nError received:\n%s", e)
+                statuses.append(False)
+        return statuses
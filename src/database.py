@@ -34,6 +34,7 @@ class SQLDatabase(Database):
 """
 
 from abc import ABC, abstractmethod
+import numpy as np
 
 
 class Database(ABC):
@@ -55,8 +56,28 @@ class Database(ABC):
 
         raise NotImplementedError
 
+    def get_feature_row(self, mrn):
+        """Pulls what the model needs for a given patient MRN, without a DataFrame.
+        The default goes through `get_data`, subclasses can override it with a direct read.
+
+        Args:
+            mrn (int): A patients MRN number
+
+        Returns:
+            tuple | None: (age, sex, dates, results) with the creatinine results as a float64 array
+            in time order and their dates as a list, None if the patient does not exist.
+        """
+        patient_data = self.get_data(mrn)
+        if patient_data.empty:
+            return None
+        date_cols = [col for col in patient_data.columns if "creatinine_date" in col]
+        results_cols = [col for col in patient_data.columns if "creatinine_result" in col]
+        dates = patient_data[date_cols].iloc[0].tolist()
+        results = patient_data[results_cols].to_numpy(dtype=np.float64, na_value=np.nan)[0]
+        return patient_data["age"].iloc[0], patient_data["sex"].iloc[0], dates, results
+
     @abstractmethod
-    def add_measurement(self, mrn, creatinine_result, creatinine_date) -> None:
+    def add_measurement(self, mrn, creatinine_result, creatinine_date) -> bool:
         """Adds a creatinine measurement for a patient to the database.
 
         Args:
@@ -64,6 +85,9 @@ class Database(ABC):
             measurement (): The creatinine measurement value
             test_date (): The date of the test
 
+        Returns:
+            bool: True if the measurement was stored, False if the write failed.
+
         Raises:
             NotImplementedError: This is an abstract method,
             and should be implemented by a subclass
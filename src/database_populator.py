@@ -1,14 +1,55 @@
 import os
 import logging
 import pandas as pd
-from datetime import datetime
 from sqlalchemy import create_engine, text
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.dialects.mysql import insert
-from src.mysql_database import Patient, Measurement
-# Configure logging
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+from src.mysql_database import ENGINE_OPTIONS, MEASUREMENT_UPSERT, PATIENT_UPSERT, Patient, Measurement
+
+def read_history(history_file):
+    """
+    Reads the wide history CSV (one row per patient) into one row per measurement.
+
+    Args:
+        history_file (str): Path to the history CSV file.
+
+    Returns:
+        tuple: The unique patient MRNs (pd.Series) and the measurements (pd.DataFrame) with
+            mrn, creatinine_date (datetime) and creatinine_result columns, one per (mrn, date).
+    """
+    # MRNs fit in int32 and results are stored as single precision FLOAT, so read them
+    # that narrow instead of pandas' int64/float64 defaults
+    columns = pd.read_csv(history_file, nrows=0).columns
+    dtypes = {col: "float32" for col in columns if col.startswith("creatinine_result")}
+    dtypes["mrn"] = "int32"
+    df = pd.read_csv(history_file, dtype=dtypes)
+
+    # Reshape the wide history (one row per patient) into one row per measurement. The row
+    # position is the id, as an MRN may appear on more than one row
+    measurements = pd.wide_to_long(
+        df.reset_index(), stubnames=["creatinine_date", "creatinine_result"], i=["index", "mrn"], j="idx", sep="_"
+    ).reset_index()
+    measurements = measurements.dropna(subset=["creatinine_date", "creatinine_result"])
+
+    # Convert dates to correct format in one pass, dropping the ones that do not parse
+    dates = pd.to_datetime(measurements["creatinine_date"], format="%Y-%m-%d %H:%M:%S", errors="coerce")
+    invalid = dates.isna()
+    if invalid.any():
+        logging.warning(f"Skipping {int(invalid.sum())} measurements with an invalid date format")
+    measurements = measurements.loc[~invalid, ["index", "idx", "mrn", "creatinine_result"]]
+    measurements.insert(3, "creatinine_date", dates[~invalid])
+
+    # Repeated rows of an MRN add up their measurements, a test found on several rows keeps
+    # the result of the last one, as upserting the rows in file order did
+    measurements = measurements.sort_values(["index", "idx"], kind="stable")
+    duplicated = measurements.duplicated(subset=["mrn", "creatinine_date"], keep="last")
+    if duplicated.any():
+        logging.warning(f"Dropping {int(duplicated.sum())} duplicate history measurements")
+        measurements = measurements[~duplicated]
+
+    measurements = measurements[["mrn", "creatinine_date", "creatinine_result"]].reset_index(drop=True)
+    return df["mrn"].drop_duplicates(), measurements
+
 
 class DatabasePopulator:
     def __init__(self, db, history_file, user="root", password="password", host="127.0.0.1", port=3306):
@@ -17,75 +58,72 @@ class DatabasePopulator:
         self.database_uri = f"mysql+pymysql://{user}:{password}@{host}:{port}/{db}"
         logging.info(f"Database URI: {self.database_uri}")
         try:
-            self.engine = create_engine(self.database_uri, echo=False)
-            self.Session = sessionmaker(bind=self.engine)
+            self.engine = create_engine(self.database_uri, echo=False, **ENGINE_OPTIONS)
+            self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
             logging.info("MySQL database connection established.")
         except SQLAlchemyError as e:
             logging.error(f"Error initializing database connection: {e}")
 
     def populate(self):
         """Populate the database with patient and measurement data."""
-        if not self.db_has_tables():
-            logging.warning("Database has no tables, please create tables first.")
-            return
-        if self.db_has_tables() and not self.db_is_populated():
-            logging.info("Database is empty, populating with history data.")
-            self.add_history_to_db()
-            logging.info("Database populated successfully.")
-        else:
-            logging.info("Everything is already OK with the database, no need to populate.")
+        # One session (and pooled connection) for the checks and the insert
+        with self.Session() as session:
+            if not self.db_has_tables(session):
+                logging.warning("Database has no tables, please create tables first.")
+                return
+            if not self.db_is_populated(session):
+                logging.info("Database is empty, populating with history data.")
+                self.add_history_to_db(session)
+                logging.info("Database populated successfully.")
+            else:
+                logging.info("Everything is already OK with the database, no need to populate.")
         
-    def add_history_to_db(self):
+    def add_history_to_db(self, session=None):
         """
         Reads the history CSV file and populates the database with patient and measurement data.
+
+        Args:
+            session (Session, optional): Session to run in, a new one is opened (and closed) if not given.
         """
-        try:
-            df = pd.read_csv(self.history_file)
+        own_session = session is None
+        if own_session:
             session = self.Session()
-
-            for index, row in df.iterrows():
-                mrn = row['mrn']
-
-                # Insert or update patient record
-                stmt = insert(Patient).values(mrn=mrn, age=None, sex=None)
-                stmt = stmt.on_duplicate_key_update(age=stmt.inserted.age, sex=stmt.inserted.sex)
-                session.execute(stmt)
-
-                # Find max index for creatinine measurements
-                max_index = max([int(col.split('_')[2]) for col in row.keys() if 'creatinine_date' in col], default=0)
-
-                for i in range(1, max_index + 1):
-                    date = row.get(f'creatinine_date_{i}')
-                    result = row.get(f'creatinine_result_{i}')
-
-                    # Skip if date or result is missing
-                    if pd.isna(date) or pd.isna(result):
-                        continue
-
-                    # Convert date to correct format
-                    try:
-                        parsed_date = datetime.strptime(date, "%Y-%m-%d %H:%M:%S")  # Adjust format if needed
-                    except ValueError:
-                        logging.warning(f"Invalid date format for MRN {mrn}: {date}")
-                        continue
-
-                    # Insert measurement
-                    stmt = insert(Measurement).values(mrn=mrn, creatinine_date=parsed_date, creatinine_result=result)
-                    stmt = stmt.on_duplicate_key_update(creatinine_result=stmt.inserted.creatinine_result)
-                    session.execute(stmt)
-
-                # Commit after processing each row
-                session.commit()
+        try:
+            mrns, measurements = read_history(self.history_file)
+
+            # Insert or update every patient record in one statement. An empty executemany
+            # has no parameters to bind, so the statements are skipped when there is nothing to add
+            patients = [{"mrn": mrn, "age": None, "sex": None} for mrn in mrns.tolist()]
+            if patients:
+                session.execute(PATIENT_UPSERT, patients)
+
+            # Insert the measurements as a single executemany
+            records = [
+                {"mrn": mrn, "creatinine_date": date, "creatinine_result": result}
+                for mrn, date, result in zip(
+                    measurements["mrn"].tolist(),
+                    pd.DatetimeIndex(measurements["creatinine_date"]).to_pydatetime(),
+                    measurements["creatinine_result"].tolist(),
+                )
+            ]
+            if records:
+                session.execute(MEASUREMENT_UPSERT, records)
+
+            # Commit the whole history in one transaction
+            session.commit()
 
         except SQLAlchemyError as e:
             session.rollback()
             logging.error(f"Error adding history: {e}")
         finally:
-            session.close()
+            if own_session:
+                session.close()
 
-    def db_has_tables(self):
-        """Check if the database contains any tables."""
-        session = self.Session()
+    def db_has_tables(self, session=None):
+        """Check if the database contains any tables, in the given session or a new one."""
+        own_session = session is None
+        if own_session:
+            session = self.Session()
         try:
             result = session.execute(text("SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = :db"), {"db": self.db})
             table_count = result.scalar()
@@ -96,38 +134,41 @@ class DatabasePopulator:
                 logging.warning("Database has no tables.")
                 return False
         except SQLAlchemyError as e:
+            session.rollback()
             logging.error(f"Error checking tables: {e}")
             return False
         finally:
-            session.close()
+            if own_session:
+                session.close()
 
-    def db_is_populated(self):
-        """Check if any table in the database has at least one row."""
-        session = self.Session()
+    def db_is_populated(self, session=None):
+        """Check if the patient or measurement table has at least one row, in the given session or a new one."""
+        own_session = session is None
+        if own_session:
+            session = self.Session()
         try:
-            result = session.execute(text("SELECT table_name FROM information_schema.tables WHERE table_schema = :db"), {"db": self.db})
-            tables = [row[0] for row in result]
-            if not tables:
-                logging.warning("Database has no tables.")
-                return False
-
-            for table in tables:
-                count_result = session.execute(text(f"SELECT COUNT(*) FROM `{table}`"))
-                row_count = count_result.scalar()
-                if row_count and row_count > 0:
-                    logging.info(f"Database is populated (Table `{table}` has {row_count} rows).")
-                    return True
+            # EXISTS stops at the first row, where COUNT(*) scanned every table in full
+            result = session.execute(text(
+                f"SELECT EXISTS (SELECT 1 FROM `{Patient.__tablename__}`) "
+                f"OR EXISTS (SELECT 1 FROM `{Measurement.__tablename__}`)"
+            ))
+            if result.scalar():
+                logging.info("Database is populated.")
+                return True
 
             logging.warning("Database has tables but no data.")
             return False
 
         except SQLAlchemyError as e:
+            session.rollback()
             logging.error(f"Error checking if database is populated: {e}")
             return False
         finally:
-            session.close()
+            if own_session:
+                session.close()
 
 # Example usage
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
     db_populator = DatabasePopulator(db="hospital_db", history_file="../data/history.csv", user="root", password="password", host="db", port=3306)
     db_populator.add_history_to_db()
@@ -29,7 +29,13 @@ from src.data_operator import DataOperator
 
 import os
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# Size of a single socket read
+RECV_SIZE = 65536
+
+# Kernel receive buffer requested for the connection
+SOCKET_RCVBUF = 1 << 20
 
 class MllpListener:
     """
@@ -42,8 +48,11 @@ class MllpListener:
     -----------
     - `parser (HL7Parser)`: HL7 message parser.
     - `mllp_address (str)`: The address (host:port) of the HL7 simulator.
+    - `mllp_addr (tuple)`: The (host, port) pair parsed from `mllp_address`.
     - `msg_queue (list)`: Queue for storing parsed messages.
     - `client_socket (socket)`: Active socket connection to the HL7 simulator.
+    - `buffer (bytearray)`: Received bytes not yet consumed as complete messages, kept across `run` calls.
+    - `recv_view (memoryview)`: Preallocated block the socket reads into.
     """
 
     def __init__(self, mllp_address: str, parser: HL7Parser, data_operator: DataOperator):
@@ -56,8 +65,15 @@ class MllpListener:
         """
         self.parser = parser 
         self.mllp_address = mllp_address
+        # Parsed once, every reconnection attempt reuses the same address tuple
+        mllp_host, mllp_port = mllp_address.split(":")
+        self.mllp_addr = (mllp_host, int(mllp_port))
         self.data_operator = data_operator
         self.client_socket = None
+        # Grows in place as data arrives, instead of rebuilding a bytes object on every recv
+        self.buffer = bytearray()
+        # Reads land in this preallocated block, no new bytes object per recv
+        self.recv_view = memoryview(bytearray(RECV_SIZE))
         self.open_connection()
     
     def open_connection(self):
@@ -67,17 +83,19 @@ class MllpListener:
         """
         while True:
             try:
-                mllp_host = self.mllp_address.split(":")[0]
-                mllp_port = int(self.mllp_address.split(":")[1])
-                logging.info(f"[*] Connecting to HL7 Simulator at {mllp_host}:{mllp_port}...")
+                logger.info("[*] Connecting to HL7 Simulator at %s...", self.mllp_address)
                 client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                 client_socket.settimeout(10)
-                client_socket.connect((mllp_host, mllp_port))
+                client_socket.connect(self.mllp_addr)
+                # ACKs are small writes, send them right away instead of waiting on Nagle
+                client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_RCVBUF)
                 self.client_socket = client_socket
-                logging.info("[+] Connected to HL7 Simulator!")
+                logger.info("[+] Connected to HL7 Simulator!")
                 break
             except (ConnectionRefusedError, ConnectionResetError):
-                logging.error(f"[-] Could not connect to {mllp_host}:{mllp_port}, retrying in 5s...")
+                client_socket.close()
+                logger.error("[-] Could not connect to %s, retrying in 5s...", self.mllp_address)
                 time.sleep(5)
         return
 
@@ -88,16 +106,20 @@ class MllpListener:
         Closes the connection and exits the system.
         """
         self.client_socket.close()
-        logging.info("[*] Connection closed. Quitting...")
+        logger.info("[*] Connection closed. Quitting...")
         exit()
         return
     
-    def send_ack(self, hl7_message):
-        # Invariant: Patient from 'parsed_message' has been processed correctly
-        # now at the very end we send an ack, maybe move this to main.py
-        ack_message = self.parser.generate_hl7_ack(hl7_message)
-        self.client_socket.sendall(ack_message)
-        logging.info(f"[ACK SENT]")
+    def send_ack(self, ack_messages):
+        # Invariant: Patients from the acknowledged messages have been processed correctly
+        # now at the very end we send the acks, maybe move this to main.py
+        # The ACKs were built when the messages were parsed, while the parser held their control IDs
+        # They are handed to the kernel as one scatter-gather write, without joining them first
+        sent = self.client_socket.sendmsg(ack_messages)
+        if sent < sum(map(len, ack_messages)):
+            # Partial write (full socket buffer), send the rest the simple way
+            self.client_socket.sendall(b"".join(ack_messages)[sent:])
+        logger.debug("[ACK SENT]")  # Fires for every batch, only worth printing when debugging
         return
 
 
@@ -106,57 +128,72 @@ class MllpListener:
         Listens for HL7 messages, processes them, and stores valid messages in the message queue.
         
         Receives data over the MLLP connection, extracts messages, and sends an acknowledgment (ACK).
+        Keeps streaming messages over the same connection until it is closed.
         """
 
-        buffer = b""
+        buffer = self.buffer
+        # Bind the per-message calls once instead of looking them up for every message
+        recv_view = self.recv_view
+        recv_into = self.client_socket.recv_into
+        parse = self.parser.parse
+        generate_ack = self.parser.generate_hl7_ack
+        process_messages = self.data_operator.process_messages
         while True: # should we replace this while true with smth
             try:
-                data = self.client_socket.recv(1024)
-                if not data:
-                    logging.info("[-] No more data, closing connection.")
+                n_bytes = recv_into(recv_view)
+                if not n_bytes:
+                    logger.info("[-] No more data, closing connection.")
                     self.shutdown()
 
-                buffer += data
-
-                while START_BLOCK in buffer and END_BLOCK in buffer:
-                    start_index = buffer.index(START_BLOCK) + 1
-                    end_index = buffer.index(END_BLOCK)
-                    hl7_message = buffer[start_index:end_index].decode("utf-8").strip()
-                    buffer = buffer[end_index + len(END_BLOCK) :]
+                buffer += recv_view[:n_bytes]
+
+                # Carve out every complete frame the buffer holds before processing any of them
+                frames = []
+                while True:
+                    # One scan for each delimiter, the end is only searched for after the start
+                    start_index = buffer.find(START_BLOCK)
+                    if start_index < 0:
+                        break
+                    end_index = buffer.find(END_BLOCK, start_index + 1)
+                    if end_index < 0:
+                        break
+                    frames.append(buffer[start_index + 1:end_index].decode("utf-8").strip())
+                    del buffer[:end_index + len(END_BLOCK)]  # Consumed in place
+
+                # Parse the frames, keeping each message's ACK for when it has been processed
+                batch = []
+                for hl7_message in frames:
+                    parsed_message = parse(hl7_message)
 
-                    parsed_message = self.parser.parse(hl7_message)
-                    
-                    
                     if parsed_message is None or parsed_message[0] is None:
-                        logging.error("Received invalid HL7 message or unknown message type:")
-                        logging.error(f"{parsed_message}")
-                        # return back to main.py without sending an ACK
+                        logger.error("Received invalid HL7 message or unknown message type:")
+                        logger.error("%s", parsed_message)
+                        # move on to the next message without sending an ACK
                         # TODO: introduce some safety mechanism here
-                        return
-
-                    # Invariant: message is parsed correctly
-                    try:
-                        # forward message to data_operator for further processing
-                        status = self.data_operator.process_message(parsed_message)
-
-                        # return the parsed_message to main.py so that it knows everything worked 
-                        # and can then send the ack-message
-                        if status:
-                            self.send_ack(hl7_message)
-                        else:
-                            # TODO: Implement safety mechanism if status is false!
-                            logging.error(f"Some error occured, check logs. Did not process the following message correctly:\n{hl7_message}")
-                        return
-
-                    except Exception as e:
-                        # log the error
-                        logging.error(f"Data Operator could not process message!\nError received:\n{e}")
-                        # and return to main.py system loop without sending an ACK message
-                        # TODO: implement/check fail safety mechanisms
-                        return
-
-                    
+                        continue
+
+                    batch.append((hl7_message, parsed_message, generate_ack()))
+
+                if not batch:
+                    continue
+
+                # Invariant: messages are parsed correctly, forward them to data_operator in one call
+                statuses = process_messages([parsed for _, parsed, _ in batch])
+
+                # ACKs of the processed messages go out together in one write
+                acks = []
+                for (hl7_message, _, ack_message), status in zip(batch, statuses):
+                    if status:
+                        acks.append(ack_message)
+                    else:
+                        # TODO: Implement safety mechanism if status is false!
+                        logger.error("Some error occured, check logs. Did not process the following message correctly:\n%s", hl7_message)
+
+                # everything worked, send the ack-messages and keep reading
+                if acks:
+                    self.send_ack(acks)
+
 
             except socket.timeout:
-                logging.warning("[-] Read timeout. Closing connection.")
+                logger.warning("[-] Read timeout. Closing connection.")
                 
\ No newline at end of file
@@ -17,7 +17,7 @@ Classes:
 Usage:
 ------
 Example:
-    model = Model(predict_queue)
+    model = Model()
     df = pd.read_csv("test.csv")
     processed_df = model.preprocess(df)
     prediction = model.predict_aki(processed_df)
@@ -26,13 +26,117 @@ Example:
 """
 
 # Imports
+from functools import lru_cache
 import pandas as pd
 from joblib import load
 import numpy as np
 import logging
-from sklearn.preprocessing import LabelEncoder
+import warnings
 
 
+# Sex codes the model was trained with (LabelEncoder order), unknown values end up as 0
+SEX_CODES = {'f': 0, 'F': 0, 'm': 1, 'M': 1}
+
+# Features in the order the model was trained on
+FEATURE_COLUMNS = [
+    'age', 'sex', 'creatinine_mean', 'creatinine_median', 'creatinine_max', 'creatinine_min',
+    'creatinine_max_delta', 'creatinine_std', 'most_recent', 'rv1_ratio', 'rv2_ratio',
+]
+
+# Number of measurement slots the model input is padded to
+PADDED_SLOTS = 50
+
+# Date/result column pairs of every slot, in input order, so padding only slices this list
+PADDING_COLUMNS = [
+    col for i in range(PADDED_SLOTS) for col in (f'creatinine_date_{i}', f'creatinine_result_{i}')
+]
+
+
+@lru_cache(maxsize=None)
+def load_model(path):
+    """
+    Loads a pretrained model from disk once per process.
+    Every `Model` built from the same path shares the deserialized model.
+
+    Args:
+        path (str): Path to the joblib file.
+
+    Returns:
+        object: The deserialized model.
+    """
+    return load(path)
+
+
+def creatinine_stats(results):
+    """
+    Computes the row-wise creatinine aggregates used as model features in a single place.
+    Missing measurements are NaN and are skipped, matching the pandas reductions this replaces.
+
+    Args:
+        results (ndarray): Float array of shape (patients, measurements).
+
+    Returns:
+        tuple: (median, max, min, std, max_delta) arrays of shape (patients,), NaN where undefined.
+    """
+    n_rows, n_cols = results.shape
+    if n_cols == 0:
+        empty = np.full(n_rows, np.nan)
+        return empty, empty, empty, empty, empty
+
+    with warnings.catch_warnings():
+        # Patients without (or with a single) measurement give all-NaN slices
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        median = np.nanmedian(results, axis=1)
+        mx = np.nanmax(results, axis=1)
+        mn = np.nanmin(results, axis=1)
+        std = np.nanstd(results, axis=1, ddof=1)
+        if n_cols > 1:
+            max_delta = np.nanmax(np.diff(results, axis=1), axis=1)
+        else:
+            max_delta = np.full(n_rows, np.nan)
+    return median, mx, mn, std, max_delta
+
+
+def featurize(results):
+    """
+    Computes the creatinine features of a single patient straight from a 1-D array.
+    This is the online path: one patient per HL7 message, where building and reducing
+    a one-row DataFrame costs far more than the arithmetic itself.
+
+    Args:
+        results (ndarray): Float array of the patient's measurements, NaN where missing.
+
+    Returns:
+        ndarray: float32 array with the mean, median, max, min, max_delta, std, most_recent,
+                 rv1_ratio and rv2_ratio features, undefined values set to 0.
+    """
+    features = np.zeros(9, dtype=np.float32)
+    present = ~np.isnan(results)
+    a = results[present]
+    if a.size == 0:
+        return features
+
+    mn = a.min()
+    median = np.median(a)
+    most_recent = a[-1]
+    # Consecutive slots only, as in the batch path where deltas next to a gap are NaN
+    deltas = np.diff(results)
+    deltas = deltas[~np.isnan(deltas)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        features[:] = (
+            a.mean(),
+            median,
+            a.max(),
+            mn,
+            deltas.max() if deltas.size else np.nan,
+            a.std(ddof=1) if a.size > 1 else np.nan,
+            most_recent,
+            most_recent / mn,
+            most_recent / median,
+        )
+    np.nan_to_num(features, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+    return features
+
 
 class Model:
     """
@@ -45,18 +149,51 @@ class Model:
     -----------
     - `predict_queue (list)`: Queue containing patient data for prediction.
     - `aki_model (object)`: Preloaded machine learning model for AKI detection.
-    - `le (LabelEncoder)`: Label encoder for categorical features.
+    - `booster (Booster)`: Underlying XGBoost booster, shared by every instance.
+    - `_column_cache (dict)`: Creatinine date/result column names, keyed by the input columns.
     """
 
-    def __init__(self):
+    def __init__(self, model_path='aki_detection.joblib'):
         """
-        Initializes the Model class with a queue and loads the pretrained AKI detection model.
+        Initializes the Model class and loads the pretrained AKI detection model.
         
         Args:
-            predict_queue (list): List containing patient records for AKI prediction.
+            model_path (str): Path to the pretrained model, loaded once per process.
         """
-        self.aki_model = load('aki_detection.joblib')
-        self.le = LabelEncoder()
+        self.aki_model = load_model(model_path)
+        self.booster = self.aki_model.get_booster()
+        self._column_cache = {}
+        self._warmup()
+
+    def _warmup(self):
+        """
+        Runs the single-patient path once on dummy data, so that the one-off setup costs
+        (booster prediction buffers, NumPy reductions) are paid at startup and not by
+        the first blood test.
+        """
+        row = np.zeros((1, len(FEATURE_COLUMNS)), dtype=np.float32)
+        row[0, 2:] = featurize(np.array([1.0, np.nan, 2.0]))
+        self.booster.inplace_predict(row)
+
+    def _measurement_columns(self, columns):
+        """
+        Splits the columns of an input frame into creatinine date and result columns.
+        The split is computed once per schema, so repeated calls with the same columns
+        skip the substring scan.
+
+        Args:
+            columns (Index): Columns of the input DataFrame.
+
+        Returns:
+            tuple: (date_cols, results_cols) lists of column names.
+        """
+        key = tuple(columns)
+        cols = self._column_cache.get(key)
+        if cols is None:
+            date_cols = [col for col in key if "creatinine_date" in col]
+            results_cols = [col for col in key if "creatinine_result" in col]
+            cols = self._column_cache[key] = (date_cols, results_cols)
+        return cols
 
 
     def add_padding(self, df):
@@ -69,10 +206,13 @@ class Model:
         Returns:
             DataFrame: Padded DataFrame with consistent feature length.
         """
-        for i in range(((len(df.columns)-2)//2), 50):
-            df[f'creatinine_date_{i}'] = 0
-            df[f'creatinine_result_{i}'] = 0
-        return df
+        start = (len(df.columns)-2)//2
+        if start >= PADDED_SLOTS:
+            return df
+        # Build the missing slots as one block and attach it with a single concat,
+        # inserting them column by column fragments the frame
+        padding = pd.DataFrame(0, index=df.index, columns=PADDING_COLUMNS[2 * start:])
+        return pd.concat([df, padding], axis=1)
     
     def process_dates(self, df):
         """
@@ -85,7 +225,7 @@ class Model:
         Returns:
             Dataframe : Dataframe with dates in seconds (int)
         """
-        date_cols = [col for col in df.columns if "creatinine_date" in col]
+        date_cols, _ = self._measurement_columns(df.columns)
         for col in date_cols:
             df[col] = pd.to_datetime(df[col], errors='coerce')
         df['ref_date'] = df[date_cols].min(axis=1)
@@ -107,25 +247,47 @@ class Model:
         Returns:
             Dataframe : Dataframe with processed features
         """
-        results_cols = [col for col in df.columns if "creatinine_result" in col]
-        date_cols = [col for col in df.columns if "creatinine_date" in col]
+        _, results_cols = self._measurement_columns(df.columns)
+        values = df[results_cols].to_numpy(dtype=np.float64, na_value=np.nan)
 
-        df['creatinine_mean'] = df[results_cols].mean(axis=1)
-        df['creatinine_median'] = df[results_cols].median(axis=1, skipna=True)
-        df['creatinine_max'] = df[results_cols].max(axis=1)
-        df['creatinine_min'] = df[results_cols].min(axis=1)
-        with pd.option_context("future.no_silent_downcasting", True):
-            df["creatinine_max_delta"] = df[results_cols].diff(axis=1).max(axis=1).fillna(0).infer_objects(copy=False) # note: this is better than df['creatinine_max'] - df['creatinine_min']
-        df['creatinine_std'] = df[results_cols].std(axis=1)
-        df['most_recent'] = df[results_cols].apply(lambda row: row.dropna().iloc[-1] if not row.dropna().empty else None, axis=1)
-        df['rv1_ratio'] = df['most_recent'] / df['creatinine_min']
-        df['rv2_ratio'] = df['most_recent'] / df['creatinine_median']
-        df = df.drop(columns=results_cols)
-        df = df.drop(columns=date_cols)
+        # A single patient (the online path) skips the DataFrame reductions entirely
+        if len(df) == 1:
+            # Unknown age/sex are 0 as in the batch path, XGBoost would read NaN as missing
+            demographics = np.nan_to_num(
+                df[['age', 'sex']].to_numpy(dtype=np.float32, na_value=np.nan)[0], nan=0.0, posinf=0.0, neginf=0.0
+            )
+            row = np.concatenate((demographics, featurize(values[0])))
+            return pd.DataFrame([row], index=df.index, columns=FEATURE_COLUMNS)
 
-        with pd.option_context("future.no_silent_downcasting", True):
-            df = df.fillna(0).infer_objects(copy=False) # Prevents FutureWarning
-        return df
+        # Build the output from the demographic columns rather than dropping every
+        # measurement column from the (wide) input frame, which copied it twice
+        features = df[['age', 'sex']].copy()
+        # The measurement block is gathered once into a single contiguous float block,
+        # instead of re-selecting it from the wide mixed-dtype frame for every aggregate
+        median, mx, mn, std, max_delta = creatinine_stats(values)
+        present = ~np.isnan(values)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # NaN for patients without measurements, as the pandas mean gave
+            features['creatinine_mean'] = np.where(present, values, 0).sum(axis=1) / present.sum(axis=1)
+        features['creatinine_median'] = median
+        features['creatinine_max'] = mx
+        features['creatinine_min'] = mn
+        features["creatinine_max_delta"] = max_delta # note: this is better than df['creatinine_max'] - df['creatinine_min']
+        features['creatinine_std'] = std
+        # Last measurement of each row: the first present slot when reading the row backwards
+        most_recent = np.full(len(values), np.nan)
+        if values.shape[1]:
+            last_idx = values.shape[1] - 1 - present[:, ::-1].argmax(axis=1)
+            most_recent = np.where(present.any(axis=1), values[np.arange(len(values)), last_idx], np.nan)
+        features['most_recent'] = most_recent
+        features['rv1_ratio'] = features['most_recent'] / features['creatinine_min']
+        features['rv2_ratio'] = features['most_recent'] / features['creatinine_median']
+
+        # One pass over a contiguous float32 block instead of a per-column fillna,
+        # also clears the +-inf ratios produced by a zero minimum/median
+        values = features.to_numpy(dtype=np.float32)
+        np.nan_to_num(values, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+        return pd.DataFrame(values, index=features.index, columns=features.columns)
 
     def preprocess(self, df):
         """
@@ -137,7 +299,7 @@ class Model:
         Returns:
             DataFrame: Processed DataFrame ready for prediction.
         """
-        df['sex'] = self.le.fit_transform(df['sex'])
+        df['sex'] = df['sex'].map(SEX_CODES)
         x = self.process_features(df)
         return x
     
@@ -152,11 +314,39 @@ class Model:
             int: 1 if AKI is detected, 0 otherwise.
         """
         x = self.preprocess(measurement_vector)
-        logging.info(f"HERE IS RIGHT BEFORE IT GOES TO PREDICTION: {x}")
-        y = self.aki_model.predict(x)
-        logging.info(f"Prediction: {y}")
+        # Formatting the feature frame is expensive, only do it when debugging
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("Features passed to the model:\n%s", x)
+        # Predict on the shared booster straight from the float32 buffer; the features
+        # are built in training order so the sklearn wrapper's checks can be skipped
+        probabilities = self.booster.inplace_predict(x.to_numpy(dtype=np.float32))
+        y = (probabilities > 0.5).astype(int)
+        logging.info("Prediction: %s", y)
         return y
         
+    def predict_one(self, age, sex, results):
+        """
+        Predicts AKI for a single patient without going through pandas.
+        This is the online path: the features are computed straight from the measurement
+        array and handed to the booster as one float32 row.
+
+        Args:
+            age (int): Age of the patient, None if unknown.
+            sex (str): Sex of the patient ('m'/'f', any case), None if unknown.
+            results (array-like): Creatinine results in time order, NaN where missing.
+
+        Returns:
+            int: 1 if AKI is detected, 0 otherwise.
+        """
+        row = np.empty((1, len(FEATURE_COLUMNS)), dtype=np.float32)
+        row[0, 0] = age if age is not None and age == age else 0  # None and NaN are unknown
+        row[0, 1] = SEX_CODES.get(sex, 0)
+        row[0, 2:] = featurize(np.asarray(results, dtype=np.float64))
+        probability = self.booster.inplace_predict(row)[0]
+        y = int(probability > 0.5)
+        logging.info("Prediction: %s", y)
+        return y
+
     def run(self):
         """
         DEPRECATED
@@ -178,8 +368,7 @@ class Model:
 
 if __name__=="__main__":
     from sklearn.metrics import fbeta_score
-    dummy_queue = []
-    model = Model(dummy_queue)
+    model = Model()
      
     # EXTRACT GROUND TRUTH VALUES FROM TEST.CSV!!!!
     # Load test dataset
@@ -189,13 +378,8 @@ if __name__=="__main__":
     df = df.drop(columns="aki")
 
 
-    # Run model prediction on the test dataset
-    predictions = []
-    for i in range(len(df)):
-        print(f"Progress: {i+1:03d}/{len(df)}")
-        row = df.iloc[[i]].copy()
-        prediction = model.predict_aki(row)
-        predictions.append(prediction)
+    # Run model prediction on the whole test dataset in one batch
+    predictions = model.predict_aki(df)
 
     # Load saved labels without headers
     #data = np.loadtxt('aki_labels.csv', delimiter=',', dtype=int)
@@ -29,12 +29,14 @@ Authors:
 """
 from datetime import datetime, timezone
 import logging
-from sqlalchemy import create_engine, Column, Integer, Float, String, DateTime, ForeignKey, Enum
+from sqlalchemy import create_engine, func, Column, Integer, Float, String, DateTime, ForeignKey, Enum
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker, declarative_base #Safer, automatic sanitizing
 from sqlalchemy.dialects.mysql import insert
+import numpy as np
 import pandas as pd
 from src.database import Database
+from src.parser import parse_hl7_timestamp
 
 Base = declarative_base()
 
@@ -66,6 +68,28 @@ class Measurement(Base):
     creatinine_date = Column(DateTime, primary_key=True, default=datetime.now())
     creatinine_result = Column(Float, nullable=False)
 
+
+def _patient_upsert():
+    """Builds the statement inserting a patient, or updating its demographics if it exists."""
+    stmt = insert(Patient)
+    return stmt.on_duplicate_key_update(age=stmt.inserted.age, sex=stmt.inserted.sex)
+
+
+def _measurement_upsert():
+    """Builds the statement inserting a measurement, or updating its result if it exists."""
+    stmt = insert(Measurement)
+    return stmt.on_duplicate_key_update(creatinine_result=stmt.inserted.creatinine_result)
+
+
+# Upserts are built once and executed with bound parameters (one dict per row, or a list of them),
+# SQLAlchemy then reuses their compiled form instead of rebuilding a statement per write
+PATIENT_UPSERT = _patient_upsert()
+MEASUREMENT_UPSERT = _measurement_upsert()
+
+# Connection pool settings shared by every engine: connections are checked before use and
+# recycled before MySQL's idle timeout drops them, so a quiet period does not cost a failed write
+ENGINE_OPTIONS = {"pool_size": 10, "pool_pre_ping": True, "pool_recycle": 1800}
+
 class MySQLDatabase(Database):
     """
     Interface for interacting with a MySQL database using SQLAlchemy ORM.
@@ -91,8 +115,8 @@ class MySQLDatabase(Database):
         database_uri = f"mysql+pymysql://{user}:{password}@{host}:{port}/{db}"
 
         try:
-            self.engine = create_engine(database_uri, echo=False)
-            self.Session = sessionmaker(bind=self.engine)
+            self.engine = create_engine(database_uri, echo=False, **ENGINE_OPTIONS)
+            self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
             #logging.disable(logging.WARNING)
             print("MySQL database object created.")
         except SQLAlchemyError as e:
@@ -125,12 +149,7 @@ class MySQLDatabase(Database):
         """
         try:
             #existing_patient = self.session.query(Patient).filter_by(mrn=mrn).first()
-            stmt = insert(Patient).values(mrn=mrn, age=age, sex=sex)
-            stmt = stmt.on_duplicate_key_update(
-                age=stmt.inserted.age,
-                sex=stmt.inserted.sex
-            )
-            self.session.execute(stmt)
+            self.session.execute(PATIENT_UPSERT, {"mrn": mrn, "age": age, "sex": sex})
             self.session.commit()
 
             print(f"Added patient with MRN {mrn}.")
@@ -138,29 +157,33 @@ class MySQLDatabase(Database):
             self.session.rollback()
             print(f"Error adding patient: {e}")
 
-    def add_measurement(self, mrn: str, creatinine_result: float, creatinine_date=None) -> None:
+    def add_measurement(self, mrn: str, creatinine_result: float, creatinine_date=None) -> bool:
         """
         Adds a new creatinine measurement for a patient.
         
         Args:
             mrn (str): Medical record number.
             creatinine_result (float): Measured creatinine value.
-            creatinine_date (datetime, optional): Timestamp of the measurement.
+            creatinine_date (datetime | str, optional): Timestamp of the measurement, HL7 strings are parsed.
+
+        Returns:
+            bool: True if the measurement was stored, False if the write was rolled back.
         """
         try:
+            if isinstance(creatinine_date, str):
+                creatinine_date = parse_hl7_timestamp(creatinine_date)
             creatinine_date = creatinine_date or datetime.now(timezone.utc)
-            stmt = insert(Measurement).values(
-                mrn=mrn, creatinine_result=creatinine_result, creatinine_date=creatinine_date
-            )
-            stmt = stmt.on_duplicate_key_update(creatinine_result=stmt.inserted.creatinine_result)
-
-            self.session.execute(stmt)
+            self.session.execute(MEASUREMENT_UPSERT, {
+                "mrn": mrn, "creatinine_result": creatinine_result, "creatinine_date": creatinine_date
+            })
             self.session.commit()
 
             print(f"Added measurement for MRN {mrn}.")
+            return True
         except SQLAlchemyError as e:
             self.session.rollback()
             print(f"Error adding measurement: {e}")
+            return False
 
     def get_data(self, mrn: str):
         """
@@ -170,7 +193,8 @@ class MySQLDatabase(Database):
             mrn (str): Medical record number (MRN) of the patient.
 
         Returns:
-            DataFrame: DataFrame with columns ['creatinine_date', 'creatinine_result'] sorted by date.
+            DataFrame: Single row with age, sex and creatinine_date_i (UNIX seconds) / creatinine_result_i
+                       columns, sorted by date.
         """
 
         #NOTE: the return value of this should be a "patient vector" that gets passed to the predict queue with
@@ -190,33 +214,28 @@ class MySQLDatabase(Database):
                 return pd.DataFrame()  # empty df if patient doesn't exist (I don't think this should happen)
 
             age, sex = patient_data.age, patient_data.sex
+            # Dates come back as UNIX seconds straight from MySQL, no datetime objects to convert later
             measurements = (
-            self.session.query(Measurement.creatinine_date, Measurement.creatinine_result)
+            self.session.query(func.unix_timestamp(Measurement.creatinine_date), Measurement.creatinine_result)
             .filter_by(mrn=mrn)
             .order_by(Measurement.creatinine_date.asc())
             .all()
             )
 
-            # Convert results to DataFrame
-            # Convert to DataFrame
-            df = pd.DataFrame(measurements, columns=['creatinine_date', 'creatinine_result'])
-
-            # Step 3: Ensure datetime format for processing
-            df['creatinine_date'] = pd.to_datetime(df['creatinine_date'], errors='coerce')
-
-            # Step 4: Convert to Feature Vector (Flatten)
+            # Flatten the query rows straight into a feature vector, no intermediate DataFrame is needed
             flattened_features = {
                 'age': age,
                 'sex': sex,
             }
 
             # Convert measurement history to columns like creatinine_date_0, creatinine_result_0, etc.
-            for i, row in df.iterrows():
-                flattened_features[f'creatinine_date_{i}'] = row['creatinine_date']
-                flattened_features[f'creatinine_result_{i}'] = row['creatinine_result']
+            for i, (creatinine_date, creatinine_result) in enumerate(measurements):
+                flattened_features[f'creatinine_date_{i}'] = creatinine_date
+                flattened_features[f'creatinine_result_{i}'] = creatinine_result
 
-            # Step 5: Convert to DataFrame (Single Row)
+            # Convert to DataFrame (Single Row), results are single precision like the FLOAT column they come from
             feature_df = pd.DataFrame([flattened_features])
+            feature_df = feature_df.astype({f'creatinine_result_{i}': 'float32' for i in range(len(measurements))})
 
             return feature_df
 
@@ -224,6 +243,37 @@ class MySQLDatabase(Database):
             logging.error(f"Error retrieving data for MRN {mrn}: {e}")
             return pd.DataFrame(columns=['creatinine_date', 'creatinine_result', 'age', 'sex'])
 
+    def get_feature_row(self, mrn: str):
+        """
+        Retrieves the demographics and creatinine measurements of a given patient, without a DataFrame.
+
+        Args:
+            mrn (str): Medical record number (MRN) of the patient.
+
+        Returns:
+            tuple | None: (age, sex, dates, results) with the results as a float64 array sorted by date
+                          and their dates as a list, None if the patient does not exist or the query failed.
+        """
+        try:
+            patient_data = self.session.query(Patient.age, Patient.sex).filter_by(mrn=mrn).first()
+            if not patient_data:
+                logging.warning(f"No patient found for MRN {mrn}")
+                return None
+
+            rows = (
+            self.session.query(Measurement.creatinine_date, Measurement.creatinine_result)
+            .filter_by(mrn=mrn)
+            .order_by(Measurement.creatinine_date.asc())
+            .all()
+            )
+            dates = [row[0] for row in rows]
+            results = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+            return patient_data.age, patient_data.sex, dates, results
+
+        except SQLAlchemyError as e:
+            logging.error(f"Error retrieving data for MRN {mrn}: {e}")
+            return None
+
 if __name__ == "__main__":
 
     #Reliability tests - Duplicate handling logic
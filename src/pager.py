@@ -20,9 +20,14 @@ Example:
 
 """
 
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import requests
-import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Deletion table turning an ISO timestamp into the pager's YYYYMMDDHHMMSS format
+_TIMESTAMP_TABLE = str.maketrans("", "", "-: T")
 
 class Pager:
     """
@@ -34,6 +39,8 @@ class Pager:
     Attributes:
     -----------
     - `pager_url (str)`: The URL of the pager system to which alerts are sent.
+    - `session (Session)`: HTTP session keeping the connection to the pager system alive between alerts.
+    - `pool (ThreadPoolExecutor)`: Background workers that post the alerts.
     """
     def __init__(self, pager_address):
         """
@@ -44,31 +51,54 @@ class Pager:
         """
         pager_host = pager_address.split(":")[0]
         pager_port = pager_address.split(":")[1]
-        self.pager_url = f"http://{pager_host}:{pager_port}/page"   
-        pass
+        self.pager_url = f"http://{pager_host}:{pager_port}/page"
+
+        # Reuse connections across alerts and let the adapter handle retries
+        # (POST is not retried by default, the pager endpoint is safe to call again)
+        retries = Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset({"POST"}),
+        )
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=50, max_retries=retries)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+
+        # Alerts are posted in the background so that a slow pager does not block message processing
+        self.pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="pager")
 
     def send_pager_alert(self, mrn, timestamp):
         """
         Sends a pager alert asynchronously.
         
+        Args:
+            mrn (int): Patient's medical record number.
+            timestamp (str): Time of the alert in ISO format.
+
+        Returns:
+            Future: Completes once the alert has been delivered or has failed.
+        """
+        return self.pool.submit(self._do_post, mrn, timestamp)
+
+    def _do_post(self, mrn, timestamp):
+        """
+        Posts a pager alert, runs on a worker of the pool.
+        
         Args:
             mrn (int): Patient's medical record number.
             timestamp (str): Time of the alert in ISO format.
         
         Retries up to three times in case of failure.
         """
-        timestamp = timestamp.replace("-", "").replace(" ", "").replace(":", "").replace('T', '').split('.')[0]
+        timestamp = timestamp.split(".", 1)[0].translate(_TIMESTAMP_TABLE)
 
         logging.info(f"[*] Sending pager alert for Patient {mrn} at {timestamp}...")
 
         content = f"{mrn},{timestamp}"
 
-        for _ in range(3):  # Retry 3 times if there is a failure
-            try:
-                response = requests.post(self.pager_url, data=content, timeout=5)
-                response.raise_for_status()
-                return
-            except requests.RequestException as e:
-                logging.warning(f"[ALERT FAILED] Retrying... {e}")
-                time.sleep(1)  # Wait before retrying
-        return
+        try:
+            response = self.session.post(self.pager_url, data=content, timeout=5)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logging.warning(f"[ALERT FAILED] {e}")
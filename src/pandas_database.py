@@ -23,9 +23,19 @@ Example:
 """
 
 from collections import defaultdict
+import logging
+import os
+import tempfile
 from src.database import Database
+import numpy as np
 import pandas as pd
 
+# Number of measurement slots added at once when a patient outgrows the table
+SLOT_BLOCK = 16
+
+# Number of staged patients after which they are appended to the table
+PENDING_THRESHOLD = 512
+
 
 class PandasDatabase(Database):
     """
@@ -36,33 +46,125 @@ class PandasDatabase(Database):
     Attributes:
     -----------
     - `df (DataFrame)`: Stores patient data with MRN as index.
+    - `next_slot (defaultdict)`: Index of the next free measurement slot for each MRN.
+    - `n_slots (int)`: Number of creatinine date/result column pairs in `df`.
+    - `_date_cols (list)`: Names of the creatinine date columns, in slot order.
+    - `_result_cols (list)`: Names of the creatinine result columns, in slot order.
+    - `_pending_rows (dict)`: New patient rows, keyed by MRN, not yet appended to `df`.
+    - `_mrn_set (set)`: MRNs present in `df`, for membership tests without going through the index.
     """
 
-    def __init__(self, filename):
+    def __init__(self, filename, cache_dir=None):
         """
         Initializes the PandasDatabase with a patient dataset.
         
         Args:
             filename (str): Path to the CSV file containing patient data.
+            cache_dir (str, optional): Directory for a pickle of the parsed CSV, reused on later starts.
+                                       No cache is read or written if not given.
         """
 
-        self.df = pd.read_csv(filename, date_format="%m/%d/%y %H:%M:%S")
+        self.df = self._read_history(filename, cache_dir)
         self.df.set_index("mrn", inplace=True)  # Set MRN as the index
+        self.df.index = self.df.index.astype(np.uint32)  # MRNs are 9 digits, half the width of int64
+
+        # Add empty 'age' and 'sex' columns in front, as one object block with a single concat
+        # (None stays None for unknown demographics)
+        demographics = pd.DataFrame({"age": None, "sex": None}, index=self.df.index, dtype=object)
+        self.df = pd.concat([demographics, self.df], axis=1)
+
+        # Name the slot columns once, the hot paths index these lists instead of parsing column names
+        self.n_slots = sum("creatinine_date" in col for col in self.df.columns)
+        self._date_cols = [f"creatinine_date_{i}" for i in range(self.n_slots)]
+        self._result_cols = [f"creatinine_result_{i}" for i in range(self.n_slots)]
+
+        # Find the first empty measurement slot of every patient once, so that
+        # adding a measurement does not have to scan the slot columns
+        filled = self.df[self._date_cols].notna().to_numpy()
+        first_empty = np.where(filled.all(axis=1), filled.shape[1], (~filled).argmax(axis=1))
+        self.next_slot = defaultdict(int, zip(self.df.index, first_empty.tolist()))
+
+        # New patients are staged here and appended to the DataFrame in one go by `flush`,
+        # instead of copying the whole DataFrame for every admission
+        self._pending_rows = {}
+        self._mrn_set = set(self.df.index.tolist())
+
+    def flush(self):
+        """
+        Appends all staged patient rows to the DataFrame with a single concatenation.
+        """
+        if not self._pending_rows:
+            return
+        new_rows = pd.DataFrame.from_dict(self._pending_rows, orient="index")
+        new_rows.index = new_rows.index.astype(np.uint32)
+        self.df = pd.concat([self.df, new_rows])
+        self._mrn_set.update(self._pending_rows)
+        self._pending_rows = {}
+
+    @staticmethod
+    def _read_history(filename, cache_dir=None):
+        """
+        Reads the history CSV, through a pickle of the parsed frame kept in `cache_dir`.
+        The pickle is used as long as it is newer than the CSV, which skips the text
+        parsing on every restart, and is rebuilt when it is stale or unreadable.
 
-        # Add empty 'age' and 'sex' columns
-        self.df.insert(1, "age", None)
-        self.df.insert(2, "sex", None)
+        Args:
+            filename (str): Path to the CSV file containing patient data.
+            cache_dir (str, optional): Directory of the pickle, the CSV is always parsed if not given.
+
+        Returns:
+            DataFrame: The patient data as read from the CSV.
+        """
+        if cache_dir is None:
+            return pd.read_csv(filename, date_format="%m/%d/%y %H:%M:%S")
+
+        cache = os.path.join(cache_dir, os.path.splitext(os.path.basename(filename))[0] + ".pkl")
+        if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(filename):
+            try:
+                return pd.read_pickle(cache)
+            except Exception as e:  # Truncated, corrupt or written by another pandas version
+                logging.warning(f"Ignoring unreadable history cache {cache}: {e}")
+
+        df = pd.read_csv(filename, date_format="%m/%d/%y %H:%M:%S")
+        try:
+            # Write to a temporary file and move it into place, so that a crash mid-write
+            # never leaves a partial pickle at the path the freshness check trusts
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".pkl.tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    df.to_pickle(f)
+                os.replace(tmp_path, cache)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+        except OSError as e:
+            logging.warning(f"Could not cache the history to {cache}: {e}")
+        return df
+
+    def _add_slots(self):
+        """
+        Extends the table by `SLOT_BLOCK` empty measurement slots with a single concatenation,
+        instead of inserting one column at a time, which fragments the DataFrame.
+        """
+        new_cols = []
+        for i in range(self.n_slots, self.n_slots + SLOT_BLOCK):
+            self._date_cols.append(f"creatinine_date_{i}")
+            self._result_cols.append(f"creatinine_result_{i}")
+            new_cols += [self._date_cols[i], self._result_cols[i]]
+        slots = pd.DataFrame(None, index=self.df.index, columns=new_cols, dtype=object)
+        self.df = pd.concat([self.df, slots], axis=1)
+        self.n_slots += SLOT_BLOCK
 
     def history_preprocessing(self):  # TODO: Delete the function
         """
         Converts date columns to datetime format for easier processing.
         """
 
-        for col in self.df.columns:
-            if "creatinine_date" in col:
-                self.df[col] = pd.to_datetime(
-                    self.df[col], format="%m/%d/%y %H:%M:%S", errors="coerce"
-                )  # Transform strings to datetime
+        # Transform strings to datetime in one call on the stacked block, instead of once per column
+        values = self.df[self._date_cols].to_numpy().ravel(order="F")
+        parsed = pd.to_datetime(values, format="%m/%d/%y %H:%M:%S", errors="coerce", cache=True)
+        self.df[self._date_cols] = parsed.values.reshape(len(self.df), self.n_slots, order="F")
 
 
     def get_past_measurements(self, mrn, creatinine_value, test_time):
@@ -79,37 +181,19 @@ class PandasDatabase(Database):
         """
         patient_vector = self.get_data(mrn)
 
-        if patient_vector is None or patient_vector.empty:
+        if patient_vector.empty:
             return None  # Handle case where patient does not exist
 
-        # Convert Series to DataFrame
-        if isinstance(patient_vector, pd.Series):
-            patient_vector = patient_vector.to_frame().T  # Convert to DataFrame
-
-
-        ### FIND LAST INDEX USED
-        # Find the last used creatinine_date column
-
-        date_cols = [
-            col
-            for col in patient_vector.columns
-            if isinstance(col, str) and "creatinine_date" in col
-        ]
-
-        last_used_n = -1  # Default if no columns exist
-
-        for col in date_cols:
-            n = int(col.split("_")[-1])  # Extract the number from creatinine_date_n
-            # print(patient_vector[col])
-            if not patient_vector[col].isna().all():  # Check if it has a value
-                last_used_n = max(last_used_n, n)
-
-        # Next available index
-        next_n = last_used_n + 1
+        # The patient's cursor already points past its last measurement
+        next_n = self.next_slot[mrn]
 
         # Column names for the new test
-        new_date_col = f"creatinine_date_{next_n}"
-        new_result_col = f"creatinine_result_{next_n}"
+        if next_n < self.n_slots:
+            new_date_col = self._date_cols[next_n]
+            new_result_col = self._result_cols[next_n]
+        else:
+            new_date_col = f"creatinine_date_{next_n}"
+            new_result_col = f"creatinine_result_{next_n}"
 
         # Append the new measurement to the patient vector does NOT modify the dataframe
         patient_vector[new_date_col] = test_time
@@ -129,8 +213,12 @@ class PandasDatabase(Database):
             DataFrame: Patient's data if found, else an empty DataFrame.
         """
 
+        # Make staged patients visible before reading
+        if mrn in self._pending_rows:
+            self.flush()
+
         # Returns df row
-        if mrn in self.df.index:  # check to see if patient exists
+        if mrn in self._mrn_set:  # check to see if patient exists
             patient_data = self.df.loc[[mrn]].copy()
             return patient_data
         else:
@@ -138,6 +226,29 @@ class PandasDatabase(Database):
                 columns=self.df.columns
             )  # initialise and return empty dataframe
 
+    def get_feature_row(self, mrn):
+        """
+        Retrieves a patient's demographics and measurements straight from the table,
+        without copying the row into a DataFrame.
+
+        Args:
+            mrn (int): Patient's medical record number.
+
+        Returns:
+            tuple | None: (age, sex, dates, results) with the results up to the patient's last slot
+                          as a float64 array and their dates as a list, None if the patient does not exist.
+        """
+        if mrn in self._pending_rows:
+            self.flush()
+
+        if mrn not in self._mrn_set:
+            return None
+        row = self.df.loc[mrn]
+        n_filled = self.next_slot[mrn]
+        dates = row[self._date_cols[:n_filled]].tolist()
+        results = row[self._result_cols[:n_filled]].to_numpy(dtype=np.float64, na_value=np.nan)
+        return row["age"], row["sex"], dates, results
+
     def add_patient(self, mrn, age=None, sex=None):
         """
         Adds a new patient entry or updates an existing one.
@@ -149,14 +260,15 @@ class PandasDatabase(Database):
         """
 
         # Check if patient already is in the system
-        if mrn in self.df.index:
+        if mrn in self._mrn_set:
 
             self.df.at[mrn, "age"] = age
             self.df.at[mrn, "sex"] = sex
         else:
-            # Create new row
-            new_row = pd.DataFrame([[age, sex]], index=[mrn], columns=["age", "sex"])
-            self.df = pd.concat([self.df, new_row])
+            # Stage the new row (or update the staged one), it is appended on the next flush
+            self._pending_rows.setdefault(mrn, {}).update(age=age, sex=sex)
+            if len(self._pending_rows) >= PENDING_THRESHOLD:
+                self.flush()
 
     def add_measurement(self, mrn, measurement, test_date):
         """
@@ -166,53 +278,34 @@ class PandasDatabase(Database):
             mrn (int): Patient's medical record number.
             measurement (float): New creatinine measurement.
             test_date (str): Timestamp of the measurement.
-        """
 
-        # Check if the patient row exists, otherwise create it ( we shouldn't have to do this currently)
-        if mrn not in self.df.index:
-            new_row = pd.DataFrame(
-                [[None] * len(self.df.columns)], columns=self.df.columns, index=[mrn]
-            )
-            self.df = pd.concat([self.df, new_row])
-
-        # Get patient data
-        patient_data = self.df.loc[mrn]
-
-        # Find the existing "creatinine_date" columns
-        date_cols = sorted(
-            [col for col in self.df.columns if "creatinine_date" in col],
-            key=lambda x: int(x.split("_")[-1]),
-        )  # Sort by index number
+        Returns:
+            bool: True, the in-memory table cannot fail to store it.
+        """
 
-        last_used_n = -1  # Default if no columns exist
-        empty_col = None  # Store first empty column if available
+        # Check if the patient row exists, otherwise stage it ( we shouldn't have to do this currently)
+        if mrn not in self._mrn_set and mrn not in self._pending_rows:
+            self._pending_rows[mrn] = {"age": None, "sex": None}
 
-        for col in date_cols:
-            n = int(col.split("_")[-1])  # Extract index number
+        # Take the patient's next free slot
+        next_n = self.next_slot[mrn]
+        self.next_slot[mrn] += 1
 
-            if pd.isna(patient_data[col]):  # Check if this column is empty
-                empty_col = n
-                break  # Stop at the first available empty column
-            else:
-                last_used_n = max(last_used_n, n)  # Keep track of the last used index
-
-        # Decide which column to use
-        if empty_col is not None:
-            next_n = empty_col  # Use first available empty slot
-        else:
-            next_n = (
-                last_used_n + 1
-            )  # Create a new column if no empty slot found (edits df)
+        # If the columns do not exist, add a block of them
+        if next_n >= self.n_slots:
+            self._add_slots()
 
         # Column names for the new test
-        new_date_col = f"creatinine_date_{next_n}"
-        new_result_col = f"creatinine_result_{next_n}"
-
-        # If the columns do not exist, add them dynamically
-        if new_date_col not in self.df.columns:
-            self.df[new_date_col] = None
-            self.df[new_result_col] = None
-
-        # Update the DataFrame with new values
-        self.df.at[mrn, new_date_col] = test_date
-        self.df.at[mrn, new_result_col] = measurement
+        new_date_col = self._date_cols[next_n]
+        new_result_col = self._result_cols[next_n]
+
+        # Update the DataFrame (or the staged row) with new values
+        if mrn in self._pending_rows:
+            self._pending_rows[mrn][new_date_col] = test_date
+            self._pending_rows[mrn][new_result_col] = measurement
+            if len(self._pending_rows) >= PENDING_THRESHOLD:
+                self.flush()
+        else:
+            self.df.at[mrn, new_date_col] = test_date
+            self.df.at[mrn, new_result_col] = measurement
+        return True
@@ -19,6 +19,7 @@ Constants:
 ----------
 - `START_BLOCK (bytes)`: MLLP start delimiter (`\x0b`).
 - `END_BLOCK (bytes)`: MLLP end delimiter (`\x1c\r`).
+- `ACK_TEMPLATE (bytes)`: Framed ACK message, formatted with the timestamp and control ID.
 
 Usage:
 ------
@@ -34,12 +35,48 @@ Example:
 
 """
 
-from datetime import datetime
+from datetime import date, datetime
+from functools import lru_cache
+import sys
+import time
 
 # MLLP Delimiters
 START_BLOCK = b"\x0b"
 END_BLOCK = b"\x1c\r"
 
+# Complete ACK frame, only the timestamp and the control ID (twice) change between messages
+ACK_TEMPLATE = START_BLOCK + b"MSH|^~\\&|||||%b||ACK^R01|%b|2.5\rMSA|AA|%b\r" + END_BLOCK
+
+
+@lru_cache(maxsize=4096)
+def parse_hl7_timestamp(timestamp: str) -> datetime:
+    """
+    Converts an HL7 timestamp (`YYYYMMDDHHMM[SS]`) into a datetime.
+    Results are memoized: the tests of a burst of messages share the same few timestamps.
+
+    Parameters:
+    -----------
+    - `timestamp (str)`: HL7 timestamp, or an ISO timestamp as used when OBR-7 is missing.
+
+    Returns:
+    --------
+    - `datetime`: The parsed timestamp.
+
+    Raises:
+    -------
+    - `ValueError`: If the timestamp is in neither format.
+    """
+    if len(timestamp) in (12, 14) and timestamp.isdigit():
+        return datetime(
+            int(timestamp[0:4]),
+            int(timestamp[4:6]),
+            int(timestamp[6:8]),
+            int(timestamp[8:10]),
+            int(timestamp[10:12]),
+            int(timestamp[12:14] or 0),
+        )
+    return datetime.fromisoformat(timestamp)
+
 
 def singleton(class_):
     """
@@ -76,13 +113,14 @@ class HL7Parser:
     - `test_timestamp (str | None)`: Timestamp of a test in ORU^R01 messages.
     - `patient_data (dict)`: Dictionary storing patient details.
     - `blood_tests (list)`: List of extracted blood test results.
+    - `msg_control_id (str)`: Control ID (MSH-10) of the parsed message, echoed in its ACK.
 
     Methods:
     --------
     - `reset()`: Clears stored data.
     - `calculate_age(dob: str) -> int | None`: Computes patient age from date of birth.
     - `parse(message: str) -> tuple[str | None, dict | None, list | None]`: Parses an HL7 message.
-    - `generate_hl7_ack(message: str) -> bytes`: Generates an HL7 acknowledgment (ACK) message.
+    - `generate_hl7_ack(message: str | None) -> bytes`: Generates an HL7 acknowledgment (ACK) message.
     """
 
     def __init__(self) -> None:
@@ -90,6 +128,18 @@ class HL7Parser:
         self.message_type = None
         self.test_timestamp = None
         self.init_time = datetime.now().isoformat()
+        # Segment handlers, segments without one are skipped without being split into fields.
+        # Each handler comes with the number of splits that isolates the last field it reads,
+        # the rest of the segment stays in one trailing string
+        self._handlers = {
+            "MSH": (self._parse_msh, 10),
+            "PID": (self._parse_pid, 9),
+            "OBR": (self._parse_obr, 8),
+            "OBX": (self._parse_obx, 6),
+        }
+        # ACK timestamps have a one second resolution, so format them once per second
+        self._ack_second = None
+        self._ack_timestamp = None
         self.reset()
 
     def reset(self) -> None:
@@ -100,6 +150,7 @@ class HL7Parser:
         self.patient_data = {}
         self.blood_tests = []
         self.test_timestamp = None
+        self.msg_control_id = "UNKNOWN"
 
     def calculate_age(self, dob: str) -> int:
         """
@@ -114,9 +165,12 @@ class HL7Parser:
         - `int`: The patient's age.
         - `None`: If the DOB is invalid.
         """
+        # Fixed-width YYYYMMDD, slicing is much cheaper than strptime's format interpreter
+        if len(dob) != 8 or not dob.isdigit():
+            return None
         try:
-            birth_date = datetime.strptime(dob, "%Y%m%d")
-            today = datetime.today()
+            birth_date = date(int(dob[:4]), int(dob[4:6]), int(dob[6:]))  # Validates the date
+            today = date.today()
             return (
                 today.year
                 - birth_date.year
@@ -146,44 +200,52 @@ class HL7Parser:
             segments = message.strip().split("\r")  # Split the message into segments
 
             for segment in segments:
-                fields = segment.split("|")  # Split each segment into fields
-                segment_type = fields[0]  # First field represents segment type
-
-                if segment_type == "MSH":
-                    self.message_type = (
-                        fields[8] if len(fields) > 8 else None
-                    )  # We find the type of the message we are currently processing
-
-                elif (
-                    segment_type == "PID"
-                ):  # If segment type is PID, we will extract patient details
-                    self._parse_pid(fields)
-
-                elif (
-                    segment_type == "OBR" and self.message_type == "ORU^R01"
-                ):  # If the current segment is "OBR",
-                    # we will extract the time at which the test was obtained
-                    self.test_timestamp = (
-                        fields[7]
-                        if len(fields) > 7 and fields[7]
-                        else datetime.now().isoformat()
-                    )
-
-                elif (
-                    segment_type == "OBX" and self.message_type == "ORU^R01"
-                ):  # If the current segment is "OBX", we will extract the value of the test
-                    self._parse_obx(fields)
+                # First field represents segment type, a single lookup picks its handler
+                handler = self._handlers.get(segment.partition("|")[0])
+                if handler is not None:
+                    parse_segment, maxsplit = handler
+                    parse_segment(segment.split("|", maxsplit))  # Split the segment into fields
             output = self._generate_output()
             if output[0] is None:
                 print(f"[ERROR] Unrecognized message type. Raw HL7 Message: {message}")
 
-            return self._generate_output()
+            return output
 
         except (TypeError, IndexError, ValueError) as e:
             print(f"Error parsing HL7 message: {e}")
 
             return None, None, None
 
+    def _parse_msh(self, fields: list) -> None:
+        """
+        Extracts the message type and control ID from an MSH segment.
+
+        Parameters:
+        -----------
+        - `fields (list)`: The fields of the MSH segment.
+        """
+        # We find the type of the message we are currently processing. It is interned so the
+        # comparisons and the dispatch on it downstream resolve on identity instead of walking the string
+        self.message_type = sys.intern(fields[8]) if len(fields) > 8 else None
+        if len(fields) > 9:  # Kept for the ACK, so it does not parse the message again
+            self.msg_control_id = fields[9]
+
+    def _parse_obr(self, fields: list) -> None:
+        """
+        Extracts the time at which the test was obtained from an OBR segment.
+
+        Parameters:
+        -----------
+        - `fields (list)`: The fields of the OBR segment.
+        """
+        if self.message_type != "ORU^R01":
+            return
+        self.test_timestamp = (
+            fields[7]
+            if len(fields) > 7 and fields[7]
+            else datetime.now().isoformat()
+        )
+
     def _parse_pid(self, fields: list) -> None:
         """
         Extracts patient details from a PID segment.
@@ -213,6 +275,8 @@ class HL7Parser:
         -----------
         - `fields (list)`: The fields of the OBX segment.
         """
+        if self.message_type != "ORU^R01":
+            return
         try:
             test_value = float(fields[5]) if len(fields) > 5 and fields[5] else None
         except (ValueError, IndexError):
@@ -227,32 +291,38 @@ class HL7Parser:
                 }
             )
 
-    @staticmethod
-    def generate_hl7_ack(message: str) -> bytes:
+    def generate_hl7_ack(self, message: str = None) -> bytes:
         """
         Generates an HL7 acknowledgment (ACK) message.
 
         Parameters:
         -----------
-        - `message (str)`: The original HL7 message.
+        - `message (str | None)`: The original HL7 message. If omitted, the control ID
+          of the last parsed message is used instead of parsing the message again.
 
         Returns:
         --------
         - `bytes`: The ACK message in HL7 format.
         """
-        msg_control_id = "UNKNOWN"
-        segments = message.split("\r")
+        if message is None:
+            msg_control_id = self.msg_control_id
+        else:
+            msg_control_id = "UNKNOWN"
+            segments = message.split("\r")
 
-        for segment in segments:
-            if segment.startswith("MSH"):
-                parts = segment.split("|")
-                if len(parts) > 9:
-                    msg_control_id = parts[9]
-
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        hl7_ack = f"MSH|^~\\&|||||{timestamp}||ACK^R01|{msg_control_id}|2.5\rMSA|AA|{msg_control_id}\r"
-
-        return START_BLOCK + hl7_ack.encode("utf-8") + END_BLOCK
+            for segment in segments:
+                if segment.startswith("MSH"):
+                    parts = segment.split("|")
+                    if len(parts) > 9:
+                        msg_control_id = parts[9]
+
+        now = int(time.time())
+        if now != self._ack_second:
+            self._ack_second = now
+            self._ack_timestamp = time.strftime("%Y%m%d%H%M%S", time.localtime(now)).encode("ascii")
+        control_id = msg_control_id.encode("utf-8")
+
+        return ACK_TEMPLATE % (self._ack_timestamp, control_id, control_id)
 
     def _generate_output(self) -> tuple[str, dict, list]:
         """Generate the parsed output based on message type."""
@@ -1,4 +1,7 @@
+import os
+import tempfile
 import unittest
+import numpy as np
 import pandas as pd
 from src.pandas_database import PandasDatabase
 
@@ -84,3 +87,40 @@ class TestDatabase(unittest.TestCase):
         patient_row = self.db.get_data(128)
         columns = self.db.df.columns
         self.assertTrue(pd.DataFrame(columns=columns).equals(patient_row))
+
+    def test_add_measurement_existing(self):
+        """Test that a new measurement goes after a patient's history."""
+        self.db.add_measurement(189386394, 130.0, "20240301120000")
+        patient_row = self.db.get_data(189386394)
+
+        self.assertEqual(patient_row["creatinine_result_5"].to_numpy(), 130.0)
+        self.assertEqual(patient_row["creatinine_result_0"].to_numpy(), 126.48)
+
+    def test_get_feature_row(self):
+        """Test getting a patient's demographics and results without a DataFrame."""
+        self.db.add_patient(189386394, 31, "F")
+        self.db.add_measurement(189386394, 130.0, "20240301120000")
+        age, sex, dates, results = self.db.get_feature_row(189386394)
+
+        self.assertEqual(age, 31)
+        self.assertEqual(sex, "F")
+        self.assertEqual(results.dtype, np.float64)
+        self.assertEqual(results[0], 126.48)
+        self.assertEqual(results[-1], 130.0)
+        self.assertEqual(len(results), 6)
+        self.assertEqual(dates[-1], "20240301120000")
+        self.assertIsNone(self.db.get_feature_row(128))
+
+    def test_history_cache(self):
+        """Test that the history cache is reused, and rebuilt when it is corrupt."""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cached = PandasDatabase("data/history.csv", cache_dir=cache_dir)
+            cache = os.path.join(cache_dir, "history.pkl")
+            self.assertTrue(os.path.exists(cache))
+            self.assertTrue(PandasDatabase("data/history.csv", cache_dir=cache_dir).df.equals(cached.df))
+
+            with open(cache, "wb") as f:
+                f.write(b"not a pickle")
+            rebuilt = PandasDatabase("data/history.csv", cache_dir=cache_dir)
+            self.assertTrue(rebuilt.df.equals(self.db.df))
+            self.assertEqual(os.listdir(cache_dir), ["history.pkl"])
@@ -0,0 +1,87 @@
+import csv
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from src.database_populator import DatabasePopulator, read_history
+from src.mysql_database import PATIENT_UPSERT
+
+
+class TestDatabasePopulator(unittest.TestCase):
+    """Unit tests for reading the history file loaded by the DatabasePopulator."""
+
+    def test_read_history_row_count(self):
+        """Test that every measurement in the history file is loaded, slot 0 included."""
+        with open("data/history.csv", newline="") as f:
+            rows = list(csv.DictReader(f))
+        expected = sum(
+            1
+            for row in rows
+            for col, value in row.items()
+            if col.startswith("creatinine_result_") and value
+        )
+
+        mrns, measurements = read_history("data/history.csv")
+        self.assertEqual(len(mrns), len(rows))
+        self.assertEqual(len(measurements), expected)
+
+        first = measurements[measurements["mrn"] == 189386394].iloc[0]
+        self.assertEqual(str(first["creatinine_date"]), "2024-01-01 15:13:00")
+        self.assertAlmostEqual(first["creatinine_result"], 126.48, places=4)
+
+    def test_read_history_duplicate_mrn(self):
+        """Test that the rows of a repeated MRN all keep their measurements."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "history.csv")
+            with open(path, "w") as f:
+                f.write("mrn,creatinine_date_0,creatinine_result_0,creatinine_date_1,creatinine_result_1\n")
+                f.write("1,2024-01-01 10:00:00,50.0,,\n")
+                f.write("2,2024-01-02 10:00:00,60.0,2024-01-03 10:00:00,61.0\n")
+                f.write("1,2024-01-04 10:00:00,70.0,2024-01-05 10:00:00,71.0\n")
+
+            mrns, measurements = read_history(path)
+
+        self.assertEqual(sorted(mrns.tolist()), [1, 2])
+        self.assertEqual(len(measurements), 5)
+        self.assertEqual(
+            sorted(measurements.loc[measurements["mrn"] == 1, "creatinine_result"].tolist()),
+            [50.0, 70.0, 71.0],
+        )
+
+    def test_read_history_duplicate_measurement(self):
+        """Test that a test found on several rows of an MRN keeps the result of the last row."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "history.csv")
+            with open(path, "w") as f:
+                f.write("mrn,creatinine_date_0,creatinine_result_0,creatinine_date_1,creatinine_result_1\n")
+                f.write("1,2024-01-01 10:00:00,50.0,2024-01-02 10:00:00,55.0\n")
+                f.write("1,2024-01-02 10:00:00,57.0,,\n")
+
+            with self.assertLogs(level="WARNING"):
+                mrns, measurements = read_history(path)
+
+        self.assertEqual(mrns.tolist(), [1])
+        self.assertEqual(measurements["creatinine_result"].tolist(), [50.0, 57.0])
+
+    def test_add_history_without_measurements(self):
+        """Test that patients without a valid measurement are still added, skipping the empty insert."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "history.csv")
+            with open(path, "w") as f:
+                f.write("mrn,creatinine_date_0,creatinine_result_0\n")
+                f.write("1,not a date,50.0\n")
+                f.write("2,,\n")
+
+            session = MagicMock()
+            with self.assertLogs(level="WARNING"):
+                DatabasePopulator("hospital_db", path).add_history_to_db(session)
+
+        session.execute.assert_called_once()
+        statement, patients = session.execute.call_args.args
+        self.assertIs(statement, PATIENT_UPSERT)
+        self.assertEqual([patient["mrn"] for patient in patients], [1, 2])
+        session.commit.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,10 @@
 import unittest
 from unittest.mock import MagicMock
-import pandas as pd
+import numpy as np
 from src.pandas_database import PandasDatabase
 from src.data_operator import DataOperator
+from src.model import Model
+from src.pager import Pager
 
 
 class TestDataOperator(unittest.TestCase):
@@ -13,26 +15,86 @@ class TestDataOperator(unittest.TestCase):
     def setUp(self):
         """Initialize Database Operator before each test."""
         self.database = MagicMock(spec = PandasDatabase)
-        self.msg_queue = []
-        self.predict_queue = []
+        self.model = MagicMock(spec = Model)
+        self.pager = MagicMock(spec = Pager)
         
         # Initialize DataOperator
-        self.operator = DataOperator(self.msg_queue, self.predict_queue, self.database)
+        self.operator = DataOperator(self.database, self.model, self.pager)
         
     def test_process_patient(self):
         """Test processing a patient measurement."""
         
-            
-        
-        self.database.get_past_measurements.return_value = [1.2, 1.5, 1.8]  # Expected past measurements (mocked)
+        self.database.get_feature_row.return_value = (30, "M", ["20250101123000"], np.array([1.4]))
+        self.model.predict_one.return_value = 1
         
         # Process patient 
-        self.operator.process_patient(123, 1.4, "20250101123000")
+        result = self.operator.process_patient(123, 1.4, "20250101123000")
         
-        self.database.get_past_measurements.assert_called_once_with(123, 1.4, "20250101123000")
+        # The measurement is stored exactly once
         self.database.add_measurement.assert_called_once_with(123, 1.4, "20250101123000")
+        self.database.get_feature_row.assert_called_once_with(123)
+        self.model.predict_one.assert_called_once_with(30, "M", [1.4])
+        self.pager.send_pager_alert.assert_called_once_with(123, "20250101123000")
+        self.assertTrue(result)
+
+    def test_process_patient_negative(self):
+        """Test that no alert is sent for a negative prediction."""
+        
+        self.database.get_feature_row.return_value = (30, "M", ["20250101123000"], np.array([1.4]))
+        self.model.predict_one.return_value = 0
+        
+        self.operator.process_patient(123, 1.4, "20250101123000")
+        
+        self.pager.send_pager_alert.assert_not_called()
+
+    def test_process_patient_unknown(self):
+        """Test that a patient without data is not predicted on."""
+        
+        self.database.get_feature_row.return_value = None
+        
+        result = self.operator.process_patient(123, 1.4, "20250101123000")
+        
+        self.model.predict_one.assert_not_called()
+        self.assertFalse(result)
+        
+    def test_process_patient_cached(self):
+        """Test that a second blood test is appended to the cached patient vector."""
+        
+        self.database.get_feature_row.return_value = (30, "M", ["20250101123000"], np.array([1.4]))
+        self.model.predict_one.return_value = 0
+        
+        self.operator.process_patient(123, 1.4, "20250101123000")
+        self.operator.process_patient(123, 1.6, "20250102123000")
+        
+        self.database.get_feature_row.assert_called_once_with(123)
+        self.assertEqual(self.database.add_measurement.call_count, 2)
+        self.model.predict_one.assert_called_with(30, "M", [1.4, 1.6])
+        
+        # A discharge drops the cached vector
+        self.operator.process_message(("ADT^A03", {"mrn": 123}, None))
+        self.operator.process_patient(123, 1.8, "20250103123000")
+        self.assertEqual(self.database.get_feature_row.call_count, 2)
+        
+    def test_process_patient_cached_late(self):
+        """Test that a result older than the cached ones gives the vector read from the database."""
         
-        self.assertEqual(len(self.predict_queue), 1)
+        self.database.get_feature_row.return_value = (30, "M", ["20250101123000"], np.array([1.4]))
+        self.model.predict_one.return_value = 0
+        
+        self.operator.process_patient(123, 1.4, "20250101123000")
+        
+        # The database returns the late result in time order, before the cached one
+        stored = (30, "M", ["20241231123000", "20250101123000"], np.array([1.2, 1.4]))
+        self.database.get_feature_row.return_value = stored
+        self.operator.process_patient(123, 1.2, "20241231123000")
+        
+        self.assertEqual(self.database.get_feature_row.call_count, 2)
+        self.model.predict_one.assert_called_with(30, "M", stored[3].tolist())
+        
+        # A later test is appended to the vector read back
+        self.operator.process_patient(123, 1.6, "20250102123000")
+        self.assertEqual(self.database.get_feature_row.call_count, 2)
+        self.model.predict_one.assert_called_with(30, "M", [1.2, 1.4, 1.6])
         
     def test_process_adt_message(self):
         """Test processing an ADT message."""
@@ -41,7 +103,7 @@ class TestDataOperator(unittest.TestCase):
         
         # Assertions
         self.database.add_patient.assert_called_once_with(123, 45, "M")
-        self.assertFalse(result)
+        self.assertTrue(result)
         
     def test_process_oru_message(self):
         """Test processing an ORU message."""
@@ -54,4 +116,45 @@ class TestDataOperator(unittest.TestCase):
         
         # Assertions
         self.operator.process_patient.assert_called_once_with(123, 1.8, "20250101123000")
-        self.assertTrue(result)
\ No newline at end of file
+        self.assertTrue(result)
+
+    def test_process_message_unknown_type(self):
+        """Test that an unknown message type is rejected."""
+        with self.assertRaises(ValueError):
+            self.operator.process_message(("ADT^A08", {"mrn": 123}, None))
+
+    def test_process_messages(self):
+        """Test that a failing message in a batch does not stop the others."""
+        messages = [
+            ("ADT^A01", {"mrn": 123, "name": "John Doe", "age": 45, "sex": "M"}),
+            ("ADT^A08", {"mrn": 123}, None),
+            ("ADT^A03", {"mrn": 123}, None),
+        ]
+        statuses = self.operator.process_messages(messages)
+        
+        self.assertEqual(statuses, [True, False, True])
+
+    def test_process_patient_cached_resend(self):
+        """Test that a test sent again replaces its cached result instead of adding one."""
+        
+        self.database.get_feature_row.return_value = (30, "M", ["20250101123000"], np.array([1.4]))
+        self.model.predict_one.return_value = 0
+        
+        self.operator.process_patient(123, 1.4, "20250101123000")
+        self.operator.process_patient(123, 1.6, "20250102123000")
+        self.operator.process_patient(123, 1.6, "20250102123000")
+        
+        self.model.predict_one.assert_called_with(30, "M", [1.4, 1.6])
+        
+    def test_process_patient_failed_write(self):
+        """Test that a measurement the database did not store is read back instead of cached."""
+        
+        self.database.get_feature_row.return_value = (30, "M", ["20250101123000"], np.array([1.4]))
+        self.model.predict_one.return_value = 0
+        
+        self.operator.process_patient(123, 1.4, "20250101123000")
+        self.database.add_measurement.return_value = False
+        self.operator.process_patient(123, 1.6, "20250102123000")
+        
+        self.assertEqual(self.database.get_feature_row.call_count, 2)
+        self.model.predict_one.assert_called_with(30, "M", [1.4])
@@ -1,6 +1,7 @@
 import unittest
+import sys
 from datetime import datetime
-from src.parser import HL7Parser
+from src.parser import HL7Parser, parse_hl7_timestamp
 
 
 class TestHL7Parser(unittest.TestCase):
@@ -8,6 +9,7 @@ class TestHL7Parser(unittest.TestCase):
     def setUp(self):
         """Initialize HL7Parser before each test."""
         self.parser = HL7Parser()
+        self.parser.reset()  # The parser is a singleton, clear what earlier tests parsed
 
     def test_initialization(self):
         """Test if parser initializes with correct default values."""
@@ -38,6 +40,7 @@ class TestHL7Parser(unittest.TestCase):
     def test_calculate_age_invalid(self):
         """Test age calculation with an invalid date format."""
         self.assertIsNone(self.parser.calculate_age("invalid"))
+        self.assertIsNone(self.parser.calculate_age("19990230"))
 
     def test_parse_adt_a01(self):
         """Test parsing an ADT^A01 (admission) message."""
@@ -126,6 +129,26 @@ class TestHL7Parser(unittest.TestCase):
 
         self.assertIn("||ACK^R01||2.5\rMSA|AA|\r\x1c\r", ack)
 
+    def test_generate_hl7_ack_after_parse(self):
+        """Test that the ACK reuses the control ID of the last parsed message."""
+        self.parser.parse("MSH|^~\\&|||||20240205120000||ADT^A03|MSG130|2.5\rPID|||654321")
+        ack = self.parser.generate_hl7_ack().decode("utf-8")
+
+        self.assertIn("MSA|AA|MSG130", ack)
+
+    def test_parse_hl7_timestamp(self):
+        """Test converting HL7 and ISO timestamps to datetimes."""
+        self.assertEqual(parse_hl7_timestamp("20250209133600"), datetime(2025, 2, 9, 13, 36))
+        self.assertEqual(parse_hl7_timestamp("202502091336"), datetime(2025, 2, 9, 13, 36))
+        self.assertEqual(parse_hl7_timestamp("2025-02-09T13:36:00"), datetime(2025, 2, 9, 13, 36))
+        with self.assertRaises(ValueError):
+            parse_hl7_timestamp("20251309133600")
+
+    def test_message_type_interned(self):
+        """Test that parsed message types are interned strings."""
+        message_type, _, _ = self.parser.parse("MSH|^~\\&|||||20240205120000||ADT^A03|MSG131|2.5\rPID|||654321")
+        self.assertIs(message_type, sys.intern("ADT^A03"))
+
     def test_singleton(self):
         """Test that HL7Parser is a singleton."""
         parser = HL7Parser()
@@ -0,0 +1,108 @@
+import unittest
+import numpy as np
+import pandas as pd
+from src.database_populator import read_history
+from src.model import FEATURE_COLUMNS, Model, featurize
+
+
+def patient_frame(patients):
+    """Builds a model input frame from (age, sex, results) tuples, NaN padded to the longest history."""
+    n_slots = max(len(results) for _, _, results in patients)
+    rows = []
+    for age, sex, results in patients:
+        row = {"age": age, "sex": sex}
+        for i in range(n_slots):
+            present = i < len(results) and not np.isnan(results[i])
+            row[f"creatinine_date_{i}"] = f"2024-01-{i + 1:02d} 10:00:00" if present else np.nan
+            row[f"creatinine_result_{i}"] = results[i] if i < len(results) else np.nan
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+class TestModel(unittest.TestCase):
+    """Unit tests that the single-patient path of the Model matches the batch path."""
+
+    # Histories covering gaps, a single measurement, no measurement at all and a zero minimum
+    # (non-finite ratios), with known and unknown demographics
+    PATIENTS = [
+        (45, "m", [100.0, 120.0, 180.0]),
+        (60, "f", [100.0, np.nan, 120.0, 130.0, np.nan, 90.0]),
+        (30, "m", [200.0]),
+        (50, "f", [np.nan, np.nan, np.nan]),
+        (70, "m", [0.0, 50.0, 60.0]),
+        (None, "x", [80.0, 95.0]),
+        (np.nan, None, [110.0, np.nan, 250.0]),
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        """Load the model once for every test."""
+        cls.model = Model()
+
+    def test_featurize_matches_batch(self):
+        """Test that featurize gives the creatinine features of the batch path, row for row."""
+        frame = patient_frame(self.PATIENTS)
+        batch = self.model.preprocess(frame.copy()).to_numpy()
+
+        for i, (_, _, results) in enumerate(self.PATIENTS):
+            with self.subTest(patient=i):
+                np.testing.assert_allclose(featurize(np.array(results)), batch[i, 2:], rtol=1e-6)
+
+    def test_process_features_single_row(self):
+        """Test that a one-row frame gives the same features as the same row in a batch."""
+        frame = patient_frame(self.PATIENTS)
+        batch = self.model.preprocess(frame.copy())
+        self.assertEqual(list(batch.columns), FEATURE_COLUMNS)
+
+        for i in range(len(self.PATIENTS)):
+            with self.subTest(patient=i):
+                single = self.model.preprocess(frame.iloc[[i]].copy()).to_numpy()
+                self.assertFalse(np.isnan(single).any())
+                np.testing.assert_allclose(single[0], batch.to_numpy()[i], rtol=1e-6)
+
+    def test_predict_one_matches_predict_aki(self):
+        """Test that predict_one gives the batch prediction of every patient."""
+        test_data = pd.read_csv("data/test.csv", nrows=300).drop(columns="aki")
+        # Upper-case and unknown sexes, unknown ages and NaN padded histories
+        test_data.loc[0:9, "sex"] = test_data.loc[0:9, "sex"].str.upper()
+        test_data.loc[10:14, "sex"] = "x"
+        test_data.loc[15:19, "sex"] = None
+        test_data["age"] = test_data["age"].astype(object)
+        test_data.loc[20:24, "age"] = None
+        test_data.loc[25:29, "age"] = np.nan
+        frame = pd.concat([test_data, patient_frame(self.PATIENTS)], ignore_index=True)
+
+        _, results_cols = self.model._measurement_columns(frame.columns)
+        expected = self.model.predict_aki(frame.copy())
+        self.assertEqual(set(expected), {0, 1})
+
+        for i, row in frame.iterrows():
+            results = row[results_cols].to_numpy(dtype=np.float64)
+            with self.subTest(patient=i):
+                self.assertEqual(self.model.predict_one(row["age"], row["sex"], results), expected[i])
+
+    def test_float32_inputs(self):
+        """Test that the float32 history and query results go through XGBoost on both paths."""
+        _, measurements = read_history("data/history.csv")
+        self.assertEqual(measurements["creatinine_result"].dtype, np.float32)
+
+        # One row shaped like MySQLDatabase.get_data: UNIX second dates and float32 results
+        history = measurements[measurements["mrn"] == 189386394]
+        row = {"age": 50, "sex": "f"}
+        for i, (date, result) in enumerate(zip(history["creatinine_date"], history["creatinine_result"])):
+            row[f"creatinine_date_{i}"] = int(date.timestamp())
+            row[f"creatinine_result_{i}"] = result
+        frame = pd.DataFrame([row]).astype({f"creatinine_result_{i}": "float32" for i in range(len(history))})
+
+        _, results_cols = self.model._measurement_columns(frame.columns)
+        self.assertTrue((frame[results_cols].dtypes == np.float32).all())
+        self.assertTrue((self.model.preprocess(frame.copy()).dtypes == np.float32).all())
+
+        prediction = self.model.predict_aki(frame.copy())
+        self.assertEqual(len(prediction), 1)
+        self.assertIn(prediction[0], (0, 1))
+        self.assertIn(self.model.predict_one(50, "f", history["creatinine_result"].to_numpy()), (0, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()